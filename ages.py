@@ -0,0 +1,113 @@
+"""
+Age labels ("Newborn", "12 days", "3 months", "41 years") for dates of birth.
+
+Ages are computed with plain integer calendar arithmetic that reproduces
+dateutil's relativedelta(today, dob) exactly, against one reference date per
+batch, and memoized per day by DOB string.
+"""
+import threading
+from datetime import date
+
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# Distinct DOBs are bounded (~36k per century), so the cache stays small; the
+# cap only guards against garbage input.
+CACHE_MAX_ENTRIES = 100000
+
+_cache = {}
+_cache_day = None
+_cache_lock = threading.Lock()
+
+
+def _days_in_month(year, month):
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return 29
+    return _DAYS_IN_MONTH[month - 1]
+
+
+def _delta(today, dob):
+    """(years, months, days) exactly as relativedelta(today, dob) reports them."""
+    ty, tm, td = today.year, today.month, today.day
+    months = (ty - dob.year) * 12 + (tm - dob.month)
+    # dob moved forward by `months`, clipped to the end of today's month
+    anchor = min(dob.day, _days_in_month(ty, tm))
+    if today >= dob:
+        if td >= anchor:
+            days = td - anchor
+        else:
+            months -= 1
+            py, pm = (ty, tm - 1) if tm > 1 else (ty - 1, 12)
+            days = td + _days_in_month(py, pm) - min(dob.day, _days_in_month(py, pm))
+    else:
+        if td <= anchor:
+            days = td - anchor
+        else:
+            months += 1
+            ny, nm = (ty, tm + 1) if tm < 12 else (ty + 1, 1)
+            days = td - _days_in_month(ty, tm) - min(dob.day, _days_in_month(ny, nm))
+    sign = -1 if months < 0 else 1
+    years, months = divmod(months * sign, 12)
+    return years * sign, months * sign, days
+
+
+def _label(years, months, days):
+    if years == 0:
+        if months == 0:
+            if days <= 1:
+                return "Newborn"
+            return f"{days} days"
+        elif days > 15:
+            return f"{months + 1} months"
+        return f"{months} months"
+    elif years == 1 and months == 0 and days == 0:
+        return "1 year"
+    else:
+        return f"{years} years"
+
+
+def _compute(dob_str, today):
+    try:
+        return _label(*_delta(today, date.fromisoformat(dob_str)))
+    except Exception:
+        return ""
+
+
+def _day_cache(today):
+    global _cache_day
+    if _cache_day != today:
+        with _cache_lock:
+            if _cache_day != today:
+                _cache.clear()
+                _cache_day = today
+    return _cache
+
+
+def ages_for(dob_strs, today=None):
+    """
+    Age labels for a whole column of ISO date strings, in order.
+
+    All entries are measured against the same reference date. Without an
+    explicit `today`, results are served from and stored in the per-day cache.
+    """
+    if today is not None:
+        return [_compute(dob, today) for dob in dob_strs]
+
+    today = date.today()
+    cache = _day_cache(today)
+    labels = []
+    for dob in dob_strs:
+        if not isinstance(dob, str):
+            labels.append(_compute(dob, today))
+            continue
+        label = cache.get(dob)
+        if label is None:
+            label = _compute(dob, today)
+            if len(cache) < CACHE_MAX_ENTRIES:
+                cache[dob] = label
+        labels.append(label)
+    return labels
+
+
+def age_label(dob_str, today=None):
+    """Age label for one ISO date string; '' if it cannot be parsed."""
+    return ages_for([dob_str], today)[0]
@@ -1,27 +1,58 @@
+import time
 from flask import Flask
 from flask_wtf.csrf import CSRFProtect
-from extensions import csrf, assets
+from extensions import csrf, mongo
 from config import Config
 from routes import register_routes
+from indexes import indexes_cli
+from search import search_cli
+from family import family_cli
+from importer import import_cli
+from export_jobs import export_queue
+from export_cache import export_cache
+from cache import employee_cache
+from fragments import fragment_cache
+from metrics import metrics
+from stats import stats_cli, stats_reconciler
+from revisions import revisions_cli
+from models import init_bootstrap
+from assets import asset_manifest, assets_cli
 
 csrf = CSRFProtect()
 
 def create_app():
+    started = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(Config)
 
     # Initialize extensions
+    mongo.init_app(app)
     csrf.init_app(app)
-    assets.init_app(app)
-
-    # SCSS Bundle (optional)
-    from flask_assets import Bundle
-    scss = Bundle('style.scss', filters='libsass', output='style.css')
-    assets.register('scss_all', scss)
+    asset_manifest.init_app(app)
+    export_queue.init_app(app)
+    export_cache.init_app(app)
+    employee_cache.init_app(app)
+    fragment_cache.init_app(app)
+    metrics.init_app(app)
+    stats_reconciler.init_app(app)
 
     # Register blueprints/routes
     register_routes(app)
 
+    # Database startup work runs on first request / `flask bootstrap`
+    init_bootstrap(app)
+    app.cli.add_command(indexes_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(family_cli)
+    app.cli.add_command(import_cli)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(revisions_cli)
+
+    startup_ms = (time.perf_counter() - started) * 1000
+    if startup_ms > app.config['STARTUP_BUDGET_MS']:
+        app.logger.warning('create_app took %.0f ms (budget %d ms)', startup_ms, app.config['STARTUP_BUDGET_MS'])
+
     return app
 
 if __name__ == '__main__':
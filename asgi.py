@@ -0,0 +1,156 @@
+"""
+Optional async serving mode (requirements-asgi.txt).
+
+    uvicorn --factory asgi:create_asgi_app --host 0.0.0.0 --port 8000
+
+Under waitress every in-flight request holds a thread while it waits on
+MongoDB. Here the read-heavy endpoints run as coroutines on an
+AsyncMongoClient, so one worker keeps thousands of them in flight:
+
+  /employee_detail, /employee_detail/<employee_id>
+  GET /admin (roster listing and search results)
+  /health, /health/pool, /health/cache and /metrics
+
+Everything else (forms, login, exports, imports) goes to the Flask app
+unchanged through a2wsgi, on ASGI_WSGI_THREADS threads.
+
+The async views run inside a Flask request context built from the ASGI
+scope, so they share the config, the signed session cookie, flash messages,
+CSRF tokens, url_for and the templates with the blueprints, and their
+responses go through the app's after-request processing, which saves the
+session. Both MongoDB clients are built from the same MONGO_* settings and
+report to the same pool and command metrics.
+"""
+import contextlib
+import io
+import time
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import request as flask_request
+from pymongo import AsyncMongoClient
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from app import create_app
+from extensions import mongo
+from metrics import metrics
+from models import bootstrap_database
+from routes.admin import admin_dashboard_async
+from routes.health import health_async
+from routes.main import employee_detail_async
+
+# Endpoints served by the event loop without any I/O: the Flask view is called as is.
+INLINE_ENDPOINTS = ('health.pool_stats', 'health.cache_stats', 'metrics')
+
+
+class AsyncMongo:
+    """The event loop's AsyncMongoClient, created on first use from the same settings as `mongo`."""
+
+    def __init__(self):
+        self._client = None
+        self._settings = None
+
+    def init_app(self, app, client=None):
+        self._settings = mongo.connection_settings()
+        self._client = client
+        app.extensions['async_mongo'] = self
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = AsyncMongoClient(self._settings['uri'], event_listeners=list(mongo.listeners),
+                                            **self._settings['options'])
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self._settings['db_name']]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+async_mongo = AsyncMongo()
+
+
+class AsyncReadPath:
+    """Runs the async views of one Flask app and turns their results into ASGI responses."""
+
+    def __init__(self, app):
+        self.app = app
+        self.bootstrapped = not app.config['BOOTSTRAP_ON_FIRST_REQUEST']
+
+    def view(self, handler):
+        async def endpoint(request):
+            if not self.bootstrapped:
+                await self._bootstrap()
+            started = time.perf_counter()
+            environ = build_environ(request.scope, io.BytesIO())
+            with self.app.request_context(environ):
+                try:
+                    rv = await handler(**request.path_params)
+                except Exception as exc:
+                    rv = self.app.handle_user_exception(exc)
+                response = self.app.process_response(self.app.make_response(rv))
+                if metrics.enabled:
+                    endpoint_name = flask_request.endpoint or '<unmatched>'
+                    metrics.request_duration.observe(time.perf_counter() - started, endpoint_name, request.method)
+                    metrics.requests.inc(endpoint_name, request.method, str(response.status_code))
+            return _asgi_response(response)
+        return endpoint
+
+    def db_view(self, view):
+        return self.view(lambda **kwargs: view(async_mongo.db, **kwargs))
+
+    def inline_view(self, view):
+        async def handler(**kwargs):
+            return view(**kwargs)
+        return self.view(handler)
+
+    async def _bootstrap(self):
+        try:
+            await run_in_threadpool(bootstrap_database, self.app)
+        except Exception:
+            # Retried on the next request, as on the threaded path.
+            self.app.logger.exception('Database bootstrap failed')
+        else:
+            self.bootstrapped = True
+
+
+def _asgi_response(response):
+    asgi_response = Response(response.get_data(), status_code=response.status_code)
+    asgi_response.raw_headers = [
+        (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()
+    ]
+    return asgi_response
+
+
+def create_asgi_app(flask_app=None):
+    """The ASGI application: async read endpoints in front of the Flask app."""
+    flask_app = flask_app or create_app()
+    async_mongo.init_app(flask_app)
+    read_path = AsyncReadPath(flask_app)
+
+    routes = [
+        Route('/employee_detail', read_path.db_view(employee_detail_async)),
+        Route('/employee_detail/{employee_id}', read_path.db_view(employee_detail_async)),
+        # POST /admin (a search submission) falls through to the Flask app.
+        Route('/admin', read_path.db_view(admin_dashboard_async)),
+        Route('/health', read_path.db_view(health_async)),
+    ]
+    for endpoint in INLINE_ENDPOINTS:
+        if endpoint not in flask_app.view_functions:
+            continue  # /metrics only exists with METRICS_ENABLED
+        for rule in flask_app.url_map.iter_rules(endpoint):
+            routes.append(Route(rule.rule, read_path.inline_view(flask_app.view_functions[endpoint])))
+    routes.append(Mount('/', app=WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_WSGI_THREADS'])))
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await async_mongo.close()
+
+    return Starlette(routes=routes, lifespan=lifespan)
@@ -0,0 +1,152 @@
+"""
+Build-time static assets.
+
+`flask assets build` compiles style.scss, copies the other shipped assets
+under content-hashed names into static/dist, writes gzip and brotli variants
+next to them and records everything in static/dist/manifest.json. libsass and
+brotli are only needed for the build (requirements-build.txt).
+
+At runtime templates call `asset_url('style.css')`. With a manifest the URL
+points at the fingerprinted file under /assets/, served with the best
+precompressed variant the client accepts and an immutable one-year
+Cache-Control, so repeat page loads never ask for it again. Without a
+manifest (a development checkout) it falls back to the plain static file.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import click
+from flask import abort, current_app, request, send_file, url_for
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+
+# Logical name -> source file under static/. .scss sources are compiled.
+ASSET_SOURCES = {
+    'style.css': 'style.scss',
+    'script.js': 'script.js',
+    'kisnarbg.png': 'kisnarbg.png',
+}
+
+# A compressed variant is kept only when it is at least this much smaller.
+MIN_SAVING = 0.1
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _compile_scss(path):
+    import sass
+    return sass.compile(filename=path, output_style='compressed').encode('utf-8')
+
+
+def _variants(data):
+    """(encoding, suffix, bytes) for every compressed form worth keeping."""
+    variants = [('gzip', '.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    if brotli is not None:
+        variants.insert(0, ('br', '.br', brotli.compress(data, quality=11)))
+    return [v for v in variants if len(v[2]) <= len(data) * (1 - MIN_SAVING)]
+
+
+def build_assets(static_dir, out_dir):
+    """Write fingerprinted assets and the manifest into out_dir (replaced). Returns the manifest."""
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    manifest = {}
+    for name, source in ASSET_SOURCES.items():
+        path = os.path.join(static_dir, source)
+        if source.endswith('.scss'):
+            data = _compile_scss(path)
+        else:
+            with open(path, 'rb') as fileobj:
+                data = fileobj.read()
+        stem, ext = os.path.splitext(name)
+        hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        with open(os.path.join(out_dir, hashed), 'wb') as fileobj:
+            fileobj.write(data)
+        encodings = []
+        for encoding, suffix, compressed in _variants(data):
+            with open(os.path.join(out_dir, hashed + suffix), 'wb') as fileobj:
+                fileobj.write(compressed)
+            encodings.append(encoding)
+        manifest[name] = {'file': hashed, 'size': len(data), 'encodings': encodings}
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as fileobj:
+        json.dump(manifest, fileobj, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetManifest:
+    """Resolves logical asset names through static/dist/manifest.json and serves the results."""
+
+    _SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+    def __init__(self):
+        self.manifest = {}
+        self.dist_dir = None
+        self._by_file = {}
+
+    def init_app(self, app):
+        path = app.config['ASSET_MANIFEST'] or os.path.join(app.static_folder, 'dist', 'manifest.json')
+        self.dist_dir = os.path.dirname(path)
+        self.load(path)
+        app.add_template_global(self.url, 'asset_url')
+        app.add_url_rule('/assets/<path:filename>', 'asset', self.send)
+        app.extensions['asset_manifest'] = self
+
+    def load(self, path):
+        try:
+            with open(path) as fileobj:
+                self.manifest = json.load(fileobj)
+        except FileNotFoundError:
+            self.manifest = {}
+        self._by_file = {entry['file']: entry for entry in self.manifest.values()}
+
+    def url(self, name):
+        entry = self.manifest.get(name)
+        if entry is None:
+            return url_for('static', filename=name)
+        return url_for('asset', filename=entry['file'])
+
+    def send(self, filename):
+        entry = self._by_file.get(filename)
+        if entry is None:
+            abort(404)
+        path = safe_join(self.dist_dir, filename)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        accepted = request.accept_encodings
+        for encoding in entry['encodings']:
+            if accepted[encoding]:
+                response = send_file(path + self._SUFFIXES[encoding], mimetype=mimetype, conditional=True,
+                                     max_age=IMMUTABLE_MAX_AGE)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_file(path, mimetype=mimetype, conditional=True, max_age=IMMUTABLE_MAX_AGE)
+        if entry['encodings']:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+asset_manifest = AssetManifest()
+
+assets_cli = AppGroup('assets', help='Static asset pipeline.')
+
+
+@assets_cli.command('build')
+def build_command():
+    """Compile, fingerprint and precompress static assets into static/dist."""
+    manifest = build_assets(current_app.static_folder, asset_manifest.dist_dir)
+    for name, entry in sorted(manifest.items()):
+        encodings = ', '.join(entry['encodings']) or 'uncompressed'
+        click.echo(f"{name} -> {entry['file']} ({entry['size']} bytes; {encodings})")
+    asset_manifest.load(os.path.join(asset_manifest.dist_dir, 'manifest.json'))
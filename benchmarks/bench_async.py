@@ -0,0 +1,198 @@
+"""
+Concurrency ceiling of the threaded server (waitress) against the async
+serving mode (uvicorn + asgi.py).
+
+    python -m benchmarks.bench_async --count 20000
+    python -m benchmarks.bench_async --scenario admin --levels 8,32,128,512 --duration 10
+
+Needs a real MongoDB (MONGO_URI; the async driver cannot use mongomock),
+requirements-asgi.txt and httpx. A synthetic roster is loaded into a scratch
+database (`employee_bench`, dropped first), then each server is started in a
+subprocess against it and driven with signed session cookies at every
+concurrency level for --duration seconds:
+
+  detail   GET /employee_detail as a random employee
+  admin    GET /admin with a random search term
+
+The employee cache is off unless --cache is given, so every request waits on
+MongoDB. For each level the report gives requests/s, p50/p99 latency and
+errors; a server's ceiling is the highest level whose p99 stays under
+--slo-ms without errors. Run the load generator on another machine than the
+servers (or at least pin them apart) for numbers worth quoting.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pymongo import MongoClient
+
+from benchmarks.suite import percentile
+from benchmarks.synthetic import as_saved, generate_employees
+
+BENCH_DB = 'employee_bench'
+SEARCH_TERMS = ['priya', 'sharma', 'engineering', 'EMP000042', 'female', 'rohan.iyer', 'manager']
+
+SERVERS = {
+    'waitress': lambda port, threads: [
+        sys.executable, '-m', 'waitress', f'--port={port}', f'--threads={threads}', '--call', 'app:create_app'],
+    'uvicorn': lambda port, threads: [
+        sys.executable, '-m', 'uvicorn', '--factory', 'asgi:create_asgi_app', '--port', str(port),
+        '--log-level', 'warning'],
+}
+
+
+def load(uri, count):
+    client = MongoClient(uri)
+    client.drop_database(BENCH_DB)
+    collection = client[BENCH_DB]['employees']
+    batch = []
+    for emp in generate_employees(count):
+        batch.append(dict(as_saved(emp), details_completed=True))
+        if len(batch) == 5000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+    ids = [str(doc['_id']) for doc in collection.find({}, {'_id': 1})]
+    client.close()
+    return ids
+
+
+def session_cookies(ids, sample):
+    """Signed session cookies, made the way the app makes them."""
+    from app import create_app
+
+    app = create_app()
+    serializer = app.session_interface.get_signing_serializer(app)
+    name = app.config['SESSION_COOKIE_NAME']
+    users = [{name: serializer.dumps({'role': 'user', 'mongo_id': _id})} for _id in random.sample(ids, sample)]
+    return users, {name: serializer.dumps({'role': 'admin'})}
+
+
+def start_server(name, port, threads, env):
+    process = subprocess.Popen(SERVERS[name](port, threads), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    import httpx
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{name} exited: {process.stderr.read().decode(errors="replace")}')
+        try:
+            # /health also runs the first-request bootstrap.
+            if httpx.get(f'http://127.0.0.1:{port}/health', timeout=5).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{name} did not become healthy on port {port}')
+
+
+async def drive(base_url, requests, level, duration, timeout):
+    """`level` concurrent clients issuing requests() until the time is up."""
+    import httpx
+
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=level, max_keepalive_connections=level)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                path, cookies = requests()
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path, cookies=cookies)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(level)))
+        wall = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+    }
+
+
+def ceiling(levels, slo_ms):
+    within = [level for level, result in levels.items()
+              if not result['errors'] and result['p99_ms'] is not None and result['p99_ms'] <= slo_ms]
+    return max(within, default=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=20000, help='Employees in the synthetic roster.')
+    parser.add_argument('--scenario', choices=('detail', 'admin'), default='detail')
+    parser.add_argument('--levels', default='8,32,128,512,1024', help='Comma-separated concurrency levels.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level.')
+    parser.add_argument('--slo-ms', type=float, default=500.0, help='p99 latency a level must stay under.')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds.')
+    parser.add_argument('--threads', type=int, default=8, help='waitress threads and ASGI_WSGI_THREADS.')
+    parser.add_argument('--server', action='append', choices=sorted(SERVERS), help='Only these servers.')
+    parser.add_argument('--cache', action='store_true', help='Keep the employee cache on.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', help='Write the JSON result here as well as to stdout.')
+    args = parser.parse_args()
+
+    uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+    print(f'Loading {args.count} synthetic employees...', file=sys.stderr)
+    ids = load(uri, args.count)
+    users, admin = session_cookies(ids, min(len(ids), 1000))
+    rng = random.Random(42)
+    if args.scenario == 'detail':
+        def requests():
+            return '/employee_detail', rng.choice(users)
+    else:
+        def requests():
+            return f'/admin?search={rng.choice(SEARCH_TERMS)}', admin
+
+    env = dict(os.environ, MONGO_URI=uri, MONGO_DB_NAME=BENCH_DB, STATS_RECONCILE_SECONDS='0',
+               ASGI_WSGI_THREADS=str(args.threads), EMPLOYEE_CACHE_ENABLED='1' if args.cache else '0')
+    levels = [int(level) for level in args.levels.split(',')]
+    results = {}
+    for name in args.server or sorted(SERVERS, reverse=True):
+        process = start_server(name, args.port, args.threads, env)
+        try:
+            per_level = {}
+            for level in levels:
+                print(f'{name}: {level} concurrent clients', file=sys.stderr)
+                per_level[level] = asyncio.run(
+                    drive(f'http://127.0.0.1:{args.port}', requests, level, args.duration, args.timeout))
+        finally:
+            process.terminate()
+            process.wait()
+        results[name] = {'levels': per_level, 'ceiling': ceiling(per_level, args.slo_ms)}
+
+    print(f"{'server':<10} {'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}", file=sys.stderr)
+    for name, result in results.items():
+        for level, row in result['levels'].items():
+            print(f"{name:<10} {level:>8} {row['rps']:>9} {row['p50_ms'] or '-':>9} {row['p99_ms'] or '-':>9} "
+                  f"{row['errors']:>7}", file=sys.stderr)
+        print(f"{name:<10} ceiling at p99 <= {args.slo_ms:g} ms: {result['ceiling'] or 'none'}", file=sys.stderr)
+
+    report = {'scenario': args.scenario, 'count': args.count, 'slo_ms': args.slo_ms,
+              'threads': args.threads, 'cache': args.cache, 'servers': results}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as fileobj:
+            fileobj.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Scaling of the parallel CSV export engine.
+
+    python -m benchmarks.bench_parallel_export --count 200000 --workers 1 2 4 8
+
+Loads a seeded synthetic roster into a scratch database (MONGO_URI, database
+`employee_bench`) unless --reuse is given, then exports it as CSV with each
+worker count and prints the timings as JSON. "1" is the regular single-process
+writer. Needs a real mongod: worker processes connect on their own, so
+mongomock cannot be used here.
+"""
+import argparse
+import io
+import json
+import os
+import time
+from pymongo import MongoClient
+
+from benchmarks.synthetic import generate_employees
+from exporters import EXPORT_PROJECTION, write_csv
+from parallel_export import run_parallel_export
+from search import search_keys
+
+
+def load(collection, count):
+    collection.drop()
+    batch = []
+    for emp in generate_employees(count):
+        emp['search_keys'] = search_keys(emp)
+        batch.append(emp)
+        if len(batch) == 5000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=200000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--reuse', action='store_true', help='Keep the existing scratch roster.')
+    args = parser.parse_args()
+
+    settings = {
+        'uri': os.getenv('MONGO_URI', 'mongodb://localhost:27017'),
+        'options': {},
+        'db_name': 'employee_bench',
+    }
+    collection = MongoClient(settings['uri'])[settings['db_name']]['employees']
+    if not args.reuse:
+        load(collection, args.count)
+    query = {'role': {'$ne': 'admin'}}
+
+    results = []
+    baseline = None
+    for workers in args.workers:
+        out = io.BytesIO()
+        start = time.perf_counter()
+        if workers == 1:
+            write_csv(collection.find(query, EXPORT_PROJECTION).batch_size(500), out)
+        else:
+            run_parallel_export(settings, query, out, workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        results.append({
+            'workers': workers,
+            'seconds': round(elapsed, 2),
+            'speedup': round(baseline / elapsed, 2),
+            'bytes': out.tell(),
+        })
+        print(json.dumps(results[-1]))
+
+    print(json.dumps({'count': collection.estimated_document_count(), 'os_cpus': os.cpu_count(),
+                      'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
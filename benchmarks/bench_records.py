@@ -0,0 +1,79 @@
+"""
+Memory held per employee by the roster listing: full stored documents,
+documents read with the listing projection, and listing-profile records.
+
+    python -m benchmarks.bench_records --count 20000
+    python -m benchmarks.bench_records --mongomock --count 5000
+
+Uses a scratch database (MONGO_URI, database `employee_bench`) that is dropped
+and rebuilt on every run. Employees are stored the way complete_profile saves
+them (password hash, search keys, family view). Memory is what the
+materialised list still holds once the cursor is exhausted, per tracemalloc.
+"""
+import argparse
+import gc
+import os
+import tracemalloc
+from pymongo import MongoClient
+from werkzeug.security import generate_password_hash
+
+from benchmarks.synthetic import as_saved, generate_employees
+from records import PROFILES, Employee
+
+
+def load(collection, count):
+    collection.drop()
+    password = generate_password_hash('bench-password')
+    batch = []
+    for emp in generate_employees(count):
+        batch.append(dict(as_saved(emp), password=password, details_completed=True))
+        if len(batch) == 5000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def retained_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size, len(held)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--mongomock', action='store_true', help='Run against mongomock instead of MONGO_URI.')
+    args = parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    collection = client['employee_bench']['employees']
+
+    print(f'Loading {args.count} synthetic employees...')
+    load(collection, args.count)
+
+    variants = [
+        ('full documents', lambda: list(collection.find({}))),
+        ('listing projection', lambda: list(collection.find({}, PROFILES['listing']))),
+        ('listing records', lambda: [Employee.from_doc(doc) for doc in collection.find({}, PROFILES['listing'])]),
+    ]
+    baseline = None
+    print(f"{'variant':<20} {'bytes/employee':>15} {'vs full':>8}")
+    for name, build in variants:
+        size, count = retained_bytes(build)
+        per_employee = size / count
+        baseline = baseline or per_employee
+        print(f'{name:<20} {per_employee:>15.0f} {baseline / per_employee:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
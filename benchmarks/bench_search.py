@@ -0,0 +1,86 @@
+"""
+Compare the legacy $regex roster search with the search-key index.
+
+    python -m benchmarks.bench_search --count 100000
+    python -m benchmarks.bench_search --mongomock --count 10000
+
+Uses a scratch database (MONGO_URI, database `employee_bench`) that is dropped
+and rebuilt on every run.
+"""
+import argparse
+import os
+import re
+import statistics
+import time
+from pymongo import MongoClient, ASCENDING
+
+from search import search_keys, build_search_query
+from benchmarks.synthetic import generate_employees
+
+TERMS = ['EMP000123', 'engineering', 'priya', 'sharma', 'rohan.iyer', '9000000042', 'female']
+
+
+def legacy_query(term):
+    exact_fields = ['employee_id', 'phone', 'gender', 'designation', 'department']
+    partial_fields = ['name', 'email']
+    return {'role': {'$ne': 'admin'}, '$or': [
+        {field: {'$regex': f'^{re.escape(term)}$', '$options': 'i'}} for field in exact_fields
+    ] + [
+        {field: {'$regex': re.escape(term), '$options': 'i'}} for field in partial_fields
+    ]}
+
+
+def indexed_query(term):
+    return dict({'role': {'$ne': 'admin'}}, **build_search_query(term))
+
+
+def load(collection, count):
+    collection.drop()
+    batch = []
+    for emp in generate_employees(count):
+        emp['search_keys'] = search_keys(emp)
+        batch.append(emp)
+        if len(batch) == 5000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+    collection.create_index([('search_keys', ASCENDING)], name='search_keys')
+
+
+def time_query(collection, query, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ids = [doc['_id'] for doc in collection.find(query, {'_id': 1})]
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--mongomock', action='store_true', help='Run against mongomock instead of MONGO_URI.')
+    args = parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    collection = client['employee_bench']['employees']
+
+    print(f'Loading {args.count} synthetic employees...')
+    load(collection, args.count)
+
+    print(f"{'term':<14} {'regex ms':>10} {'hits':>7} {'index ms':>10} {'hits':>7} {'speedup':>8}")
+    for term in TERMS:
+        regex_ms, regex_hits = time_query(collection, legacy_query(term), args.repeat)
+        index_ms, index_hits = time_query(collection, indexed_query(term), args.repeat)
+        print(f'{term:<14} {regex_ms:>10.2f} {regex_hits:>7} {index_ms:>10.2f} {index_hits:>7} '
+              f'{regex_ms / index_ms if index_ms else 0:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Measure worker cold start: a fresh interpreter importing the app and calling
+create_app(), which must not touch MongoDB.
+
+    python -m benchmarks.bench_startup --runs 10
+
+MONGO_URI points at an unroutable address by default, so any accidental
+database work at startup shows up as a server-selection timeout rather than
+a fast number.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = (
+    'import time; t = time.perf_counter(); '
+    'from app import create_app; create_app(); '
+    'print((time.perf_counter() - t) * 1000)'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='Fail if the median exceeds this (defaults to STARTUP_BUDGET_MS).')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('MONGO_URI', 'mongodb://192.0.2.1:27017/employee_management')
+    env['MONGO_SERVER_SELECTION_TIMEOUT_MS'] = '2000'
+    budget = args.budget_ms or float(env.get('STARTUP_BUDGET_MS', 500))
+
+    samples = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, '-c', PROBE], env=env, check=True,
+                             capture_output=True, text=True).stdout
+        samples.append(float(out.strip().splitlines()[-1]))
+
+    result = {
+        'runs': args.runs,
+        'median_ms': round(statistics.median(samples), 1),
+        'max_ms': round(max(samples), 1),
+        'budget_ms': budget,
+    }
+    print(json.dumps(result, indent=2))
+    if result['median_ms'] > budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
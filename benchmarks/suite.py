@@ -0,0 +1,294 @@
+"""
+Benchmark suite: request scenarios through the Flask test client plus
+micro-benchmarks, reported as JSON.
+
+    python -m benchmarks.suite --mongomock --count 2000
+    python -m benchmarks.suite --count 50000 --output results.json
+    python -m benchmarks.suite --mongomock --compare results.json
+
+Loads a seeded synthetic roster into a scratch database (MONGO_URI, database
+`employee_bench`, dropped first; or mongomock from requirements-bench.txt).
+A share of the employees is stored the way old profiles were saved (mixed
+date formats, no stored family view) and the rest the way complete_profile
+saves them now.
+
+Every scenario reports p50/p95/p99/mean in milliseconds, ops/s and the peak
+Python heap of one extra traced pass (tracemalloc is kept out of the timed
+loop). --compare prints the change against an earlier result file and exits
+non-zero when any p95 regressed by more than --threshold percent.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from werkzeug.security import generate_password_hash
+
+from benchmarks.synthetic import as_saved, generate_employees
+
+BENCH_DB = 'employee_bench'
+BENCH_PASSWORD = 'bench-password'
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples_ms, wall_s):
+    return {
+        'iterations': len(samples_ms),
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'mean_ms': round(statistics.fmean(samples_ms), 3),
+        'min_ms': round(min(samples_ms), 3),
+        'max_ms': round(max(samples_ms), 3),
+        'ops_per_s': round(len(samples_ms) / wall_s, 1) if wall_s else None,
+    }
+
+
+def run_scenario(fn, iterations, warmup):
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    wall = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    result = summarize(samples, time.perf_counter() - wall)
+
+    tracemalloc.start()
+    fn(iterations)
+    result['peak_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    tracemalloc.stop()
+    return result
+
+
+# ── Setup ────────────────────────────────────────────────────────
+
+def make_app(use_mongomock):
+    from app import create_app
+    from extensions import mongo
+    from export_cache import export_cache
+    from models import bootstrap_database
+
+    app = create_app()
+    # Export scenarios measure generation; with the cache on, every call
+    # after the first would time a file copy instead.
+    app.config.update(WTF_CSRF_ENABLED=False, MONGO_DB_NAME=BENCH_DB, EXPORT_CACHE_ENABLED=False)
+    export_cache.init_app(app)
+    if use_mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    client.drop_database(BENCH_DB)
+    mongo.init_app(app, client=client)
+    with app.app_context():
+        bootstrap_database(app)
+    return app
+
+
+def load_roster(app, count, seed, legacy_share):
+    from extensions import employees_collection
+
+    # One real hash for everyone: login then does the same work it does in production.
+    password = generate_password_hash(BENCH_PASSWORD)
+    rng = random.Random(seed)
+    legacy, batch = [], []
+    with app.app_context():
+        for emp in generate_employees(count, seed=seed, date_style='mixed'):
+            emp['password'] = password
+            if rng.random() < legacy_share:
+                legacy.append(dict(emp))
+            else:
+                emp = as_saved(emp)
+            batch.append(emp)
+            if len(batch) == 5000:
+                employees_collection.insert_many(batch)
+                batch = []
+        if batch:
+            employees_collection.insert_many(batch)
+    return legacy
+
+
+# ── Scenarios ────────────────────────────────────────────────────
+
+def build_scenarios(app, count, legacy, seed):
+    from family import normalize_family, family_view
+
+    rng = random.Random(seed)
+    employee_ids = [f'EMP{i:06d}' for i in range(count)]
+    rng.shuffle(employee_ids)
+    phones = [f'{9000000000 + i}' for i in range(count)]
+    rng.shuffle(phones)
+    search_terms = ['priya', 'sharma', 'engineering', 'EMP000042', 'female', 'rohan.iyer', 'manager']
+
+    user = app.test_client()
+    admin = app.test_client()
+    with admin.session_transaction() as session:
+        session['role'] = 'admin'
+
+    def request(client, method, url, redirect_to=None, **kwargs):
+        # A redirect is only a success where one is expected (and to the
+        # expected place); elsewhere it is usually a flash for an error.
+        response = client.open(url, method=method, **kwargs)
+        response.get_data()
+        response.close()
+        if redirect_to is None:
+            ok = response.status_code < 300
+        else:
+            ok = 300 <= response.status_code < 400 and urlsplit(response.location).path == redirect_to
+        if not ok:
+            raise RuntimeError(f'{method} {url} returned {response.status_code} {response.location or ""}'.rstrip())
+
+    def login(i):
+        request(user, 'POST', '/login', redirect_to='/employee_detail', data={
+            'role': 'user', 'identifier': phones[i % count], 'passcode': BENCH_PASSWORD
+        })
+
+    def dashboard(i):
+        request(admin, 'GET', '/admin')
+
+    def dashboard_search(i):
+        request(admin, 'GET', '/admin', query_string={'search': search_terms[i % len(search_terms)]})
+
+    def employee_detail(i):
+        request(admin, 'GET', f'/employee_detail/{employee_ids[i % count]}')
+
+    def export_csv(i):
+        request(admin, 'POST', '/export_handler', data={'export_type': 'csv'})
+
+    def export_excel(i):
+        request(admin, 'POST', '/export_handler', data={'export_type': 'excel'})
+
+    sample = legacy[:200] or [dict(emp) for emp in generate_employees(200, seed=seed, date_style='mixed')]
+
+    def normalize_legacy(i):
+        # In memory only: every call sees a document without the stored view.
+        normalize_family({'family_members': [dict(m) for m in sample[i % len(sample)]['family_members']]})
+
+    def build_family_view(i):
+        family_view([dict(m) for m in sample[i % len(sample)]['family_members']])
+
+    # name -> (function, share of --iterations, needs app context)
+    return {
+        'auth.login': (login, 0.1, False),
+        'admin.admin_dashboard': (dashboard, 1, False),
+        'admin.admin_dashboard.search': (dashboard_search, 1, False),
+        'main.employee_detail': (employee_detail, 1, False),
+        'export.generate_csv': (export_csv, 0.05, False),
+        'export.generate_excel': (export_excel, 0.05, False),
+        'family.normalize_family': (normalize_legacy, 10, True),
+        'family.family_view': (build_family_view, 10, True),
+    }
+
+
+# ── Reporting ────────────────────────────────────────────────────
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as fileobj:
+        baseline = json.load(fileobj)['scenarios']
+    regressed = []
+    print(f"{'scenario':<32} {'p50 ms':>10} {'Δ':>8} {'p95 ms':>10} {'Δ':>8}", file=sys.stderr)
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        deltas = [(current[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+                  for key in ('p50_ms', 'p95_ms')]
+        print(f"{name:<32} {current['p50_ms']:>10.2f} {deltas[0]:>+7.1f}% "
+              f"{current['p95_ms']:>10.2f} {deltas[1]:>+7.1f}%", file=sys.stderr)
+        if deltas[1] > threshold:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongomock', action='store_true', help='Run against mongomock instead of MONGO_URI.')
+    parser.add_argument('--count', type=int, default=2000, help='Employees in the synthetic roster.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--legacy-share', type=float, default=0.3,
+                        help='Fraction of employees stored in the pre-normalization shape.')
+    parser.add_argument('--iterations', type=int, default=200,
+                        help='Base iteration count; each scenario scales it by its own weight.')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--scenario', action='append', help='Run only these scenarios (repeatable).')
+    parser.add_argument('--output', help='Write the JSON result here as well as to stdout.')
+    parser.add_argument('--compare', help='Earlier result file to compare against.')
+    parser.add_argument('--threshold', type=float, default=20.0, help='Allowed p95 regression in percent.')
+    args = parser.parse_args()
+
+    app = make_app(args.mongomock)
+    started = time.perf_counter()
+    legacy = load_roster(app, args.count, args.seed, args.legacy_share)
+    load_s = time.perf_counter() - started
+
+    results = {}
+    for name, (fn, weight, needs_context) in build_scenarios(app, args.count, legacy, args.seed).items():
+        if args.scenario and name not in args.scenario:
+            continue
+        iterations = max(3, int(args.iterations * weight))
+        print(f'{name}: {iterations} iterations', file=sys.stderr)
+        if needs_context:
+            with app.app_context():
+                results[name] = run_scenario(fn, iterations, args.warmup)
+        else:
+            results[name] = run_scenario(fn, iterations, args.warmup)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': 'mongomock' if args.mongomock else 'mongod',
+            'count': args.count,
+            'seed': args.seed,
+            'legacy_share': args.legacy_share,
+            'load_s': round(load_s, 2),
+            # ru_maxrss is KiB on Linux
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'scenarios': results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as fileobj:
+            fileobj.write(output + '\n')
+
+    if args.compare:
+        regressed = compare(results, args.compare, args.threshold)
+        if regressed:
+            print(f"p95 regressed more than {args.threshold}%: {', '.join(regressed)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Seeded synthetic roster for benchmarks.
+
+The same seed always yields the same employees, so runs are comparable.
+Dates are drawn relative to a fixed reference day, not today, so a roster is
+identical whenever it is generated.
+
+Marital status drives the family: married employees get a spouse, married and
+divorced/widowed ones get 0-3 children, and anyone may list 0-2 parents.
+With date_style='mixed' dates come in the formats older profiles were saved
+with (DD-MM-YYYY, DD/MM/YYYY, D.M.YYYY alongside ISO).
+"""
+import random
+from datetime import date, timedelta
+
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Ananya', 'Diya', 'Ishaan', 'Kavya', 'Meera',
+               'Rohan', 'Saanvi', 'Arjun', 'Priya', 'Rahul', 'Sneha', 'Vikram', 'Neha']
+LAST_NAMES = ['Sharma', 'Verma', 'Iyer', 'Nair', 'Reddy', 'Patel', 'Gupta', 'Singh',
+              'Kumar', 'Das', 'Mehta', 'Joshi', 'Rao', 'Chopra', 'Bose', 'Khan']
+DESIGNATIONS = ['Engineer', 'Senior Engineer', 'Manager', 'Analyst', 'Associate', 'Director']
+DEPARTMENTS = ['Engineering', 'Finance', 'HR', 'Operations', 'Sales', 'Support']
+
+REFERENCE_DATE = date(2025, 1, 1)
+
+# (format, weight) for date_style='mixed'
+DATE_FORMATS = [('{y:04d}-{m:02d}-{d:02d}', 40), ('{d:02d}-{m:02d}-{y:04d}', 35),
+                ('{d:02d}/{m:02d}/{y:04d}', 20), ('{d}.{m}.{y:04d}', 5)]
+
+
+def _dob(rng, min_age, max_age):
+    return REFERENCE_DATE - timedelta(days=rng.randint(min_age * 365, max_age * 365))
+
+
+def _date_formatter(date_style, seed):
+    if date_style == 'iso':
+        return lambda value: value.isoformat()
+    # A separate stream, so the employees themselves match the ISO roster.
+    rng = random.Random(seed + 1)
+    formats, weights = zip(*DATE_FORMATS)
+
+    def fmt(value):
+        return rng.choices(formats, weights)[0].format(y=value.year, m=value.month, d=value.day)
+    return fmt
+
+
+def generate_employees(count, seed=42, date_style='iso'):
+    """
+    Yield `count` employee documents in the raw profile shape (no stored
+    family view). date_style is 'iso' or 'mixed'.
+    """
+    rng = random.Random(seed)
+    fmt = _date_formatter(date_style, seed)
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        marital_status = rng.choices(['unmarried', 'married', 'divorced/widowed'], [35, 60, 5])[0]
+        family = []
+        if marital_status == 'married':
+            family.append({
+                'relationship': 'Spouse', 'name': f'{rng.choice(FIRST_NAMES)} {last}',
+                'date_of_birth': fmt(_dob(rng, 22, 60)),
+                'gender': rng.choice(['Male', 'Female']), 'age': ''
+            })
+        if marital_status != 'unmarried':
+            for c in range(rng.choices([0, 1, 2, 3], [20, 35, 35, 10])[0]):
+                family.append({
+                    'relationship': 'Child', 'name': f'{rng.choice(FIRST_NAMES)} {last} {c}',
+                    'date_of_birth': fmt(_dob(rng, 0, 25)), 'phone': '',
+                    'gender': rng.choice(['Male', 'Female']), 'age': ''
+                })
+        for rel in rng.sample(['Mother', 'Father'], rng.choice([0, 1, 2])):
+            family.append({
+                'relationship': rel, 'name': f'{rng.choice(FIRST_NAMES)} {last}',
+                'date_of_birth': fmt(_dob(rng, 50, 85)), 'age': ''
+            })
+        yield {
+            'employee_id': f'EMP{i:06d}',
+            'name': f'{first} {last}',
+            'phone': f'{9000000000 + i}',
+            'email': f'{first.lower()}.{last.lower()}{i}@example.com',
+            'designation': rng.choice(DESIGNATIONS),
+            'department': rng.choice(DEPARTMENTS),
+            'gender': rng.choice(['Male', 'Female']),
+            'dob': fmt(_dob(rng, 21, 60)),
+            'date_of_joining': fmt(_dob(rng, 0, 20)),
+            'marital_status': marital_status,
+            'sum_insured_gmc': rng.choice([300000, 500000, 1000000]),
+            'sum_insured_gpa': rng.choice([500000, 1000000]),
+            'sum_insured_gtl': rng.choice([1000000, 2000000]),
+            'password': 'pbkdf2:sha256:600000$bench$0000',
+            'details_completed': True,
+            'family_members': family,
+        }
+
+
+def as_saved(emp):
+    """The document as complete_profile saves it today: ISO dates, stored family view, search keys."""
+    from dates import to_iso_date
+    from family import family_view
+    from search import search_keys
+
+    emp = dict(emp)
+    for key in ('dob', 'date_of_joining'):
+        emp[key] = to_iso_date(emp[key])
+    family = [dict(m, date_of_birth=to_iso_date(m['date_of_birth'])) for m in emp.get('family_members', [])]
+    emp.update(family_view(family))
+    emp['search_keys'] = search_keys(emp)
+    return emp
@@ -0,0 +1,81 @@
+"""
+Check ages.py against the relativedelta implementation it replaced, and time both.
+
+    python -m benchmarks.verify_ages
+
+The corpus covers every DOB from 1930 to two years ahead of each reference
+date. The reference dates include leap days, month ends and year ends, where
+clipping to the end of the month matters. Exits non-zero on any mismatch.
+"""
+import sys
+import time
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+
+from ages import ages_for
+
+REFERENCE_DATES = [
+    date(2024, 2, 29), date(2024, 3, 1), date(2023, 2, 28), date(2023, 3, 31),
+    date(2024, 1, 31), date(2024, 12, 31), date(2025, 1, 1), date(2024, 4, 30),
+    date(2024, 5, 15), date.today(),
+]
+
+
+def reference_label(dob_str, today):
+    """The original utils.calc_age, with `today` passed in."""
+    try:
+        dob = date.fromisoformat(dob_str)
+        delta = relativedelta(today, dob)
+        if delta.years == 0:
+            if delta.months == 0:
+                if delta.days <= 1:
+                    return "Newborn"
+                return f"{delta.days} days"
+            elif delta.days > 15:
+                return f"{delta.months + 1} months"
+            return f"{delta.months} months"
+        elif delta.years == 1 and delta.months == 0 and delta.days == 0:
+            return "1 year"
+        else:
+            return f"{delta.years} years"
+    except Exception:
+        return ""
+
+
+def corpus(today):
+    day = date(1930, 1, 1)
+    end = today + timedelta(days=730)
+    dobs = []
+    while day <= end:
+        dobs.append(day.isoformat())
+        day += timedelta(days=1)
+    return dobs + ['', 'not-a-date', '2024-02-30', '20240101', None]
+
+
+def main():
+    mismatches = 0
+    legacy_s = engine_s = 0.0
+    checked = 0
+    for today in REFERENCE_DATES:
+        dobs = corpus(today)
+        start = time.perf_counter()
+        expected = [reference_label(d, today) for d in dobs]
+        legacy_s += time.perf_counter() - start
+        start = time.perf_counter()
+        actual = ages_for(dobs, today)
+        engine_s += time.perf_counter() - start
+        checked += len(dobs)
+        for dob, want, got in zip(dobs, expected, actual):
+            if want != got:
+                mismatches += 1
+                if mismatches <= 20:
+                    print(f'MISMATCH today={today} dob={dob!r}: expected {want!r}, got {got!r}')
+
+    print(f'{checked} DOB/reference pairs checked, {mismatches} mismatches')
+    print(f'relativedelta: {legacy_s * 1000:.0f} ms   ages.ages_for: {engine_s * 1000:.0f} ms   '
+          f'({legacy_s / engine_s:.1f}x)')
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""
+Employee document cache.
+
+Lookups by `_id` or `employee_id` go through three tiers:
+
+  1. the current request (flask.g), so a page that needs the same employee
+     twice reads it once;
+  2. a bounded in-process LRU with a TTL;
+  3. an optional shared backend (EMPLOYEE_CACHE_BACKEND), so that every worker
+     process sees the same entries.
+
+Every write path calls `employee_cache.invalidate(_id, employee_id)` with
+the _ids it wrote. Entries are dropped by _id, never found through an
+'eid:' alias, which may have been evicted first. Other processes' local
+tiers are not told about a write, so EMPLOYEE_CACHE_TTL bounds how stale
+they can be. Documents are cached without the password hash and are
+stored as BSON, so callers always get their own copy to mutate.
+
+The async read path (asgi.py) has its own *_async lookups. They skip the
+shared backend, whose client would block the event loop.
+"""
+import threading
+import time
+from collections import OrderedDict
+import bson
+from bson import ObjectId, errors as bson_errors
+from flask import g, has_app_context
+from werkzeug.utils import import_string
+from extensions import employees_collection
+
+CACHED_PROJECTION = {'password': 0}
+
+
+class LocalBackend:
+    """
+    In-process stand-in for a shared key/value store such as Redis or
+    memcached: get, set with a TTL in seconds, and delete.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class CacheStats:
+    """Counters bumped from request threads; `add` and `snapshot` hold a lock."""
+
+    def __init__(self):
+        self.request_hits = 0
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self):
+        with self._lock:
+            hits = self.request_hits + self.local_hits + self.shared_hits
+            lookups = hits + self.misses
+            return {
+                'request_hits': self.request_hits,
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_ratio': round(hits / lookups, 3) if lookups else None,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+            }
+
+
+class EmployeeCache:
+    """
+    Cached employee lookups. Entries are stored under 'id:<_id>'; an
+    'eid:<employee_id>' alias points at the _id.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.max_entries = 2048
+        self.ttl = 30
+        self.backend = None
+        self.stats = CacheStats()
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, backend=None):
+        config = app.config
+        self.enabled = config['EMPLOYEE_CACHE_ENABLED']
+        self.max_entries = config['EMPLOYEE_CACHE_SIZE']
+        self.ttl = config['EMPLOYEE_CACHE_TTL']
+        if backend is None and config['EMPLOYEE_CACHE_BACKEND']:
+            name = config['EMPLOYEE_CACHE_BACKEND']
+            backend = LocalBackend() if name == 'local' else import_string(name)(app)
+        self.backend = backend
+        self.clear()
+        app.extensions['employee_cache'] = self
+
+    # ── Lookups ──────────────────────────────────────────────────
+
+    def by_id(self, _id):
+        """Employee by _id (ObjectId or its string form), or None."""
+        if not isinstance(_id, ObjectId):
+            try:
+                _id = ObjectId(_id)
+            except (bson_errors.InvalidId, TypeError):
+                return None
+        return self._lookup(f'id:{_id}', {'_id': _id})
+
+    def by_employee_id(self, employee_id):
+        """Employee by employee code, or None."""
+        if not employee_id:
+            return None
+        return self._lookup(f'eid:{employee_id}', {'employee_id': employee_id})
+
+    def _lookup(self, key, query):
+        if not self.enabled:
+            return employees_collection.find_one(query, CACHED_PROJECTION)
+
+        memo = self._request_memo()
+        if key in memo:
+            self.stats.add('request_hits')
+            return bson.decode(memo[key])
+
+        data = self._get(key)
+        if data is None:
+            self.stats.add('misses')
+            doc = employees_collection.find_one(query, CACHED_PROJECTION)
+            if doc is None:
+                return None
+            data = bson.encode(doc)
+            self._put(doc, data)
+        memo[key] = data
+        return bson.decode(data)
+
+    # ── Async lookups (asgi.py) ──────────────────────────────────
+
+    async def by_id_async(self, collection, _id):
+        """by_id for the async read path; `collection` comes from an AsyncMongoClient."""
+        if not isinstance(_id, ObjectId):
+            try:
+                _id = ObjectId(_id)
+            except (bson_errors.InvalidId, TypeError):
+                return None
+        return await self._lookup_async(f'id:{_id}', {'_id': _id}, collection)
+
+    async def by_employee_id_async(self, collection, employee_id):
+        if not employee_id:
+            return None
+        return await self._lookup_async(f'eid:{employee_id}', {'employee_id': employee_id}, collection)
+
+    async def _lookup_async(self, key, query, collection):
+        # Shared backends are blocking clients, so the event loop only uses the in-process tiers.
+        if not self.enabled:
+            return await collection.find_one(query, CACHED_PROJECTION)
+
+        memo = self._request_memo()
+        if key in memo:
+            self.stats.add('request_hits')
+            return bson.decode(memo[key])
+
+        data = self._get(key, shared=False)
+        if data is None:
+            self.stats.add('misses')
+            doc = await collection.find_one(query, CACHED_PROJECTION)
+            if doc is None:
+                return None
+            data = bson.encode(doc)
+            self._put(doc, data, shared=False)
+        memo[key] = data
+        return bson.decode(data)
+
+    def _request_memo(self):
+        if not has_app_context():
+            return {}
+        if 'employee_cache' not in g:
+            g.employee_cache = {}
+        return g.employee_cache
+
+    # ── Tiers ────────────────────────────────────────────────────
+
+    def _get(self, key, shared=True):
+        key = self._resolve(key, shared)
+        if key is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at >= now:
+                    self._local.move_to_end(key)
+                    self.stats.add('local_hits')
+                    return data
+                del self._local[key]
+        if shared and self.backend is not None:
+            data = self.backend.get(key)
+            if data is not None:
+                self.stats.add('shared_hits')
+                self._store_local(key, data)
+                return data
+        return None
+
+    def _resolve(self, key, shared=True):
+        """Map an 'eid:' alias to its 'id:' key; None if the alias is unknown."""
+        if not key.startswith('eid:'):
+            return key
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                return entry[1]
+        if shared and self.backend is not None:
+            target = self.backend.get(key)
+            if target is not None:
+                return target.decode() if isinstance(target, bytes) else target
+        return None
+
+    def _put(self, doc, data, shared=True):
+        key = f"id:{doc['_id']}"
+        self._store_local(key, data)
+        alias = f"eid:{doc['employee_id']}" if doc.get('employee_id') else None
+        if alias:
+            self._store_local(alias, key)
+        if shared and self.backend is not None:
+            self.backend.set(key, data, self.ttl)
+            if alias:
+                self.backend.set(alias, key, self.ttl)
+
+    def _store_local(self, key, value):
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self.stats.add('evictions')
+
+    # ── Invalidation ─────────────────────────────────────────────
+
+    def invalidate(self, _id, employee_id=None):
+        """
+        Forget employees after a write. `_id` is required (one or a list);
+        employee codes, old and new, drop their aliases.
+        """
+        _ids = _id if isinstance(_id, (list, tuple, set)) else [_id]
+        employee_ids = employee_id if isinstance(employee_id, (list, tuple, set)) else [employee_id]
+        keys = {f'id:{oid}' for oid in _ids if oid is not None}
+        keys.update(f'eid:{eid}' for eid in employee_ids if eid)
+
+        self._request_memo().clear()
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+        if self.backend is not None and keys:
+            self.backend.delete(*keys)
+        self.stats.add('invalidations')
+
+    def __len__(self):
+        return len(self._local)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+
+employee_cache = EmployeeCache()
@@ -4,3 +4,102 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'your_super_secret_key')
     MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/employee_management')
     WTF_CSRF_ENABLED = True
+
+    # MongoDB client (one per process, see extensions.Mongo)
+    MONGO_DB_NAME = os.environ.get('MONGO_DB_NAME', 'employee_management')
+    MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 50))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', 'zlib')
+    MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+    MONGO_WRITE_CONCERN = os.environ.get('MONGO_WRITE_CONCERN', '')
+    MONGO_ENSURE_INDEXES = os.environ.get('MONGO_ENSURE_INDEXES', '1') == '1'
+
+    # Startup: no database work at import or in create_app
+    BOOTSTRAP_ON_FIRST_REQUEST = os.environ.get('BOOTSTRAP_ON_FIRST_REQUEST', '1') == '1'
+    STARTUP_BUDGET_MS = int(os.environ.get('STARTUP_BUDGET_MS', 500))
+
+    # Exports
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+    EXPORT_CSV_CHUNK_ROWS = int(os.environ.get('EXPORT_CSV_CHUNK_ROWS', 200))
+    # 'python' flattens employees in the app; 'pipeline' has MongoDB build the
+    # rows with an aggregation pipeline (see export_pipeline.py).
+    EXPORT_ENGINE = os.environ.get('EXPORT_ENGINE', 'python')
+    # Excel exports of at least this many employees switch from the styled
+    # in-memory workbook to the write-only engine that spools to a temp file.
+    # Below it the regular path is fast enough and keeps openpyxl's defaults.
+    EXCEL_STREAMING_THRESHOLD = int(os.environ.get('EXCEL_STREAMING_THRESHOLD', 5000))
+
+    # Parquet export: rows per record batch (needs pyarrow, requirements-parquet.txt)
+    EXPORT_PARQUET_BATCH_ROWS = int(os.environ.get('EXPORT_PARQUET_BATCH_ROWS', 10000))
+
+    # Delta export: only revisions at least this old are delivered, so writes
+    # still in flight are not skipped past (see revisions.py).
+    DELTA_SETTLE_SECONDS = int(os.environ.get('DELTA_SETTLE_SECONDS', 5))
+
+    # Cache of generated exports, keyed by request and roster version;
+    # EXPORT_CACHE_DIR defaults to <instance>/export_cache.
+    EXPORT_CACHE_ENABLED = os.environ.get('EXPORT_CACHE_ENABLED', '1') == '1'
+    EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR', '')
+    EXPORT_CACHE_MAX_MB = int(os.environ.get('EXPORT_CACHE_MAX_MB', 512))
+
+    # Background export jobs; EXPORT_DIR defaults to <instance>/exports
+    EXPORT_DIR = os.environ.get('EXPORT_DIR', '')
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+    EXPORT_JOB_STALE_SECONDS = int(os.environ.get('EXPORT_JOB_STALE_SECONDS', 600))
+    # Finished jobs and their files are deleted this long after they finish; 0 keeps them.
+    EXPORT_JOB_TTL_HOURS = int(os.environ.get('EXPORT_JOB_TTL_HOURS', 24))
+    # Background CSV jobs of at least EXPORT_PARALLEL_THRESHOLD employees are
+    # sharded across this many processes; 0 or 1 keeps them single-process.
+    # Excel jobs always run in one process (see parallel_export.py).
+    EXPORT_PARALLEL_WORKERS = int(os.environ.get('EXPORT_PARALLEL_WORKERS', 0))
+    EXPORT_PARALLEL_THRESHOLD = int(os.environ.get('EXPORT_PARALLEL_THRESHOLD', 20000))
+
+    # Bulk import: employees per bulk_write
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+    IMPORT_MAX_UPLOAD_MB = int(os.environ.get('IMPORT_MAX_UPLOAD_MB', 50))
+
+    # Employee lookup cache. EMPLOYEE_CACHE_BACKEND is 'local' for the in-process
+    # stand-in or an import path to a factory taking the app and returning an
+    # object with get/set(key, value, ttl)/delete(*keys); empty for none.
+    EMPLOYEE_CACHE_ENABLED = os.environ.get('EMPLOYEE_CACHE_ENABLED', '1') == '1'
+    EMPLOYEE_CACHE_SIZE = int(os.environ.get('EMPLOYEE_CACHE_SIZE', 2048))
+    EMPLOYEE_CACHE_TTL = int(os.environ.get('EMPLOYEE_CACHE_TTL', 30))
+    EMPLOYEE_CACHE_BACKEND = os.environ.get('EMPLOYEE_CACHE_BACKEND', '')
+
+    # Metrics: /metrics in Prometheus text format, request and Mongo command
+    # timings. Off by default. /metrics, /health/pool and /health/cache need
+    # METRICS_TOKEN as a bearer token or an admin session; with no token set
+    # only admins can read them. /health stays public.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    MONGO_SLOW_QUERY_MS = int(os.environ.get('MONGO_SLOW_QUERY_MS', 100))
+
+    # Roster statistics: the summary is rebuilt from a full scan this often in
+    # a background thread. Every process that creates the app would start one,
+    # so it is off by default; run `flask stats reconcile` from cron, or set
+    # this on a single process only.
+    STATS_RECONCILE_SECONDS = int(os.environ.get('STATS_RECONCILE_SECONDS', 0))
+
+    # Fingerprinted assets from `flask assets build`; defaults to
+    # <static>/dist/manifest.json. Without one, templates use plain static files.
+    ASSET_MANIFEST = os.environ.get('ASSET_MANIFEST', '')
+
+    # Async serving mode (asgi.py): threads that run the Flask app for the
+    # endpoints the event loop does not serve itself.
+    ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 8))
+
+    # Template caches (fragments.py): compiled templates on disk, defaulting to
+    # <instance>/jinja_cache, and rendered roster rows/profile sections in memory.
+    JINJA_BYTECODE_CACHE = os.environ.get('JINJA_BYTECODE_CACHE', '1') == '1'
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR', '')
+    FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', '1') == '1'
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 10000))
+
+    # Admin roster paging
+    ADMIN_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', 50))
+    ADMIN_MAX_PAGE_SIZE = int(os.environ.get('ADMIN_MAX_PAGE_SIZE', 500))
+    ADMIN_COUNT_ESTIMATE = os.environ.get('ADMIN_COUNT_ESTIMATE', '1') == '1'
+    ADMIN_COUNT_LIMIT = int(os.environ.get('ADMIN_COUNT_LIMIT', 1000))
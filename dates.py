@@ -0,0 +1,59 @@
+"""
+Date normalization shared by the profile form, the exports and the importer.
+
+Accepted inputs are the formats the app has always tolerated: YYYY-MM-DD and
+DD-MM-YYYY with '-', '/' or '.' as separator (one- or two-digit day/month).
+Recognition is a single precompiled pattern and parsed results are memoized,
+so the hot export loop never goes through strptime or exception handling for
+well-formed values.
+"""
+import re
+from datetime import date
+from functools import lru_cache
+
+DATE_CACHE_SIZE = 8192
+
+_DATE_RE = re.compile(
+    r'^(?:(?P<y1>\d{4})(?P<s1>[-/.])(?P<m1>\d{1,2})(?P=s1)(?P<d1>\d{1,2})'
+    r'|(?P<d2>\d{1,2})(?P<s2>[-/.])(?P<m2>\d{1,2})(?P=s2)(?P<y2>\d{4}))$'
+)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse(date_str):
+    match = _DATE_RE.match(date_str)
+    if not match:
+        return None
+    if match.group('y1'):
+        year, month, day = match.group('y1', 'm1', 'd1')
+    else:
+        year, month, day = match.group('y2', 'm2', 'd2')
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def parse_date(date_str):
+    """Return a date for any accepted format, or None."""
+    if not date_str or not isinstance(date_str, str):
+        return None
+    return _parse(date_str)
+
+
+def format_date_ddmmyyyy(date_str):
+    """Format as DD-MM-YYYY; unrecognised values are returned unchanged."""
+    if not date_str:
+        return ''
+    parsed = parse_date(date_str)
+    if parsed is None:
+        return date_str
+    return f'{parsed.day:02d}-{parsed.month:02d}-{parsed.year:04d}'
+
+
+def to_iso_date(date_str):
+    """Normalize to YYYY-MM-DD for storage; unrecognised values are returned unchanged."""
+    parsed = parse_date(date_str)
+    if parsed is None:
+        return date_str
+    return parsed.isoformat()
@@ -0,0 +1,121 @@
+"""
+Export artifact cache.
+
+Generated CSV/XLSX files are kept on local disk (EXPORT_CACHE_DIR, default
+<instance>/export_cache), named after a key built from the export fingerprint
+(type, search, selection; see export_jobs.export_fingerprint), the database,
+the roster version and the current day, since exported ages are relative to
+today. Every employee write or delete bumps the roster version
+(stats.bump_version), so a key never names stale content and nothing has to
+be invalidated.
+
+The directory is bounded by EXPORT_CACHE_MAX_MB. Serving a file refreshes its
+mtime, and the least recently served files are evicted first.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date
+from extensions import mongo
+
+EXTENSIONS = {'csv': '.csv', 'excel': '.xlsx', 'parquet': '.zip'}
+
+_TEMP_PREFIX = '.partial-'
+
+
+class ExportCache:
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.max_bytes = 512 * 1024 * 1024
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config['EXPORT_CACHE_ENABLED']
+        self.directory = config['EXPORT_CACHE_DIR'] or os.path.join(app.instance_path, 'export_cache')
+        self.max_bytes = config['EXPORT_CACHE_MAX_MB'] * 1024 * 1024
+        app.extensions['export_cache'] = self
+
+    @staticmethod
+    def key(fingerprint, roster_version):
+        payload = f'{mongo.db.name}:{fingerprint}:{roster_version}:{date.today().isoformat()}'
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def path(self, key, export_type):
+        return os.path.join(self.directory, key + EXTENSIONS[export_type])
+
+    def get(self, key, export_type):
+        """Path of the cached artifact, or None. Counts as a use for eviction."""
+        path = self.path(key, export_type)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store(self, key, export_type, fileobj):
+        """Copy a finished artifact (read from its current position) into the cache."""
+        with self.writer(key, export_type) as out:
+            shutil.copyfileobj(fileobj, out)
+
+    def writer(self, key, export_type):
+        """File to write an artifact into; it is published when the with-block completes."""
+        return _PendingArtifact(self, self.path(key, export_type))
+
+    def tee(self, chunks, key, export_type):
+        """Pass byte chunks through, caching them once the last one has been sent."""
+        with self.writer(key, export_type) as out:
+            for chunk in chunks:
+                out.write(chunk)
+                yield chunk
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.startswith(_TEMP_PREFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def clear(self):
+        if self.directory and os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+
+
+class _PendingArtifact:
+    """Temp file in the cache directory, renamed into place on success and removed otherwise."""
+
+    def __init__(self, cache, path):
+        self.cache = cache
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        os.makedirs(self.cache.directory, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=self.cache.directory, prefix=_TEMP_PREFIX, delete=False)
+        return self._file
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        # Covers GeneratorExit too: a client that disconnects mid-download leaves nothing behind.
+        if exc_type is not None or os.path.getsize(self._file.name) > self.cache.max_bytes:
+            os.remove(self._file.name)
+            return False
+        os.replace(self._file.name, self.path)
+        self.cache._evict()
+        return False
+
+
+export_cache = ExportCache()
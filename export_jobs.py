@@ -0,0 +1,220 @@
+"""
+Background export queue.
+
+Submitting an export stores a job document in the `export_jobs` collection
+and hands it to a small local thread pool; the request returns at once. The
+worker writes the artifact to EXPORT_DIR and records progress on the job, which
+the admin dashboard polls. Identical requests (same type, search and
+selection) share the job that is already queued or running.
+
+Finished jobs expire EXPORT_JOB_TTL_HOURS after they finish. Submitting a job
+sweeps expired ones (at most once a minute per process), deleting the file
+and the job document; an expired job can no longer be downloaded.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId, errors as bson_errors
+from pymongo.errors import DuplicateKeyError
+from extensions import mongo, employees_collection, export_jobs_collection
+from exporters import (
+    EXPORT_PROJECTION, EXCEL_MIMETYPE, build_export_query, iter_export_rows, track_progress, write_csv_rows,
+    write_excel_rows
+)
+from export_pipeline import iter_pipeline_rows
+from parallel_export import run_parallel_export
+from metrics import metrics
+
+EXPORT_FORMATS = {
+    'csv': ('employees_nested.csv', 'text/csv'),
+    'excel': ('employees_nested.xlsx', EXCEL_MIMETYPE),
+    'parquet': ('employees_parquet.zip', 'application/zip'),
+}
+
+
+def export_fingerprint(export_type, search, selected_ids):
+    """Stable key for an export request, independent of selection order."""
+    payload = json.dumps({
+        'type': export_type,
+        'search': ' '.join(search.split()).lower(),
+        'selected_ids': sorted({eid for eid in selected_ids if eid}),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class ExportQueue:
+    """Local worker pool running export jobs whose state lives in Mongo."""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self.export_dir = None
+        self.workers = 2
+        self.batch_size = 500
+        self.progress_every = 500
+        self.stale_after = timedelta(minutes=10)
+        self.parallel_workers = 0
+        self.parallel_threshold = 0
+        self.engine = 'python'
+        self.ttl = None
+        self._last_sweep = 0.0
+
+    def init_app(self, app):
+        config = app.config
+        self.export_dir = config['EXPORT_DIR'] or os.path.join(app.instance_path, 'exports')
+        self.workers = config['EXPORT_WORKERS']
+        self.batch_size = config['EXPORT_BATCH_SIZE']
+        self.stale_after = timedelta(seconds=config['EXPORT_JOB_STALE_SECONDS'])
+        self.parallel_workers = config['EXPORT_PARALLEL_WORKERS']
+        self.parallel_threshold = config['EXPORT_PARALLEL_THRESHOLD']
+        self.engine = config['EXPORT_ENGINE']
+        self.ttl = timedelta(hours=config['EXPORT_JOB_TTL_HOURS']) if config['EXPORT_JOB_TTL_HOURS'] else None
+        app.extensions['export_queue'] = self
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='export')
+        return self._executor
+
+    def get(self, job_id):
+        try:
+            return export_jobs_collection.find_one({'_id': ObjectId(job_id)})
+        except (bson_errors.InvalidId, TypeError):
+            return None
+
+    def is_expired(self, job):
+        finished_at = job.get('finished_at')
+        if self.ttl is None or finished_at is None:
+            return False
+        if finished_at.tzinfo is None:
+            finished_at = finished_at.replace(tzinfo=timezone.utc)
+        return _now() - finished_at > self.ttl
+
+    def sweep(self):
+        """Delete expired finished jobs and their files. Returns the number removed."""
+        if self.ttl is None:
+            return 0
+        removed = 0
+        expired = export_jobs_collection.find({'finished_at': {'$lt': _now() - self.ttl}}, {'path': 1})
+        for job in expired:
+            if job.get('path'):
+                try:
+                    os.remove(job['path'])
+                except FileNotFoundError:
+                    pass
+            removed += export_jobs_collection.delete_one({'_id': job['_id']}).deleted_count
+        return removed
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < 60:
+                return
+            self._last_sweep = now
+        self.sweep()
+
+    def submit(self, export_type, search, selected_ids):
+        """Return the active job for this request, creating and queueing one if needed."""
+        self._maybe_sweep()
+        fingerprint = export_fingerprint(export_type, search, selected_ids)
+        job = {
+            'fingerprint': fingerprint,
+            'active': True,
+            'export_type': export_type,
+            'search': search,
+            'selected_ids': [eid for eid in selected_ids if eid],
+            'status': 'queued',
+            'rows_written': 0,
+            'total': None,
+            'created_at': _now(),
+            'updated_at': _now(),
+        }
+        for _ in range(2):
+            try:
+                export_jobs_collection.insert_one(job)
+                break
+            except DuplicateKeyError:
+                # The unique index on active fingerprints makes the dedupe race-free.
+                job.pop('_id', None)
+                existing = export_jobs_collection.find_one({'fingerprint': fingerprint, 'active': True})
+                if existing and not self._is_stale(existing):
+                    return existing
+                if existing:
+                    self._finish(existing['_id'], 'failed', error='Abandoned by a stopped worker.')
+        else:
+            raise RuntimeError('Could not queue export job.')
+
+        self.executor.submit(self._run, job['_id'])
+        return job
+
+    def _is_stale(self, job):
+        updated_at = job.get('updated_at')
+        if updated_at is None:
+            return True
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        return _now() - updated_at > self.stale_after
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = _now()
+        export_jobs_collection.update_one({'_id': job_id}, {'$set': fields})
+
+    def _finish(self, job_id, status, **fields):
+        fields.update({'status': status, 'finished_at': _now(), 'updated_at': _now()})
+        export_jobs_collection.update_one({'_id': job_id}, {'$set': fields, '$unset': {'active': ''}})
+
+    def _rows(self, query, progress):
+        if self.engine == 'pipeline':
+            return iter_pipeline_rows(query, self.batch_size, progress=progress, every=self.progress_every)
+        employees = employees_collection.find(query, EXPORT_PROJECTION).batch_size(self.batch_size)
+        return iter_export_rows(track_progress(employees, progress, self.progress_every))
+
+    def _run(self, job_id):
+        job = export_jobs_collection.find_one({'_id': job_id})
+        filename, mimetype = EXPORT_FORMATS[job['export_type']]
+        path = os.path.join(self.export_dir, f'{job_id}{os.path.splitext(filename)[1]}')
+        started = time.perf_counter()
+        mode = 'job'
+        try:
+            query = build_export_query(job['search'], job['selected_ids'])
+            total = employees_collection.count_documents(query)
+            self._update(job_id, status='running', started_at=_now(), total=total)
+
+            def progress(count):
+                self._update(job_id, rows_written=count)
+
+            os.makedirs(self.export_dir, exist_ok=True)
+            with open(path, 'wb') as fileobj:
+                if (job['export_type'] == 'csv' and self.parallel_workers > 1
+                        and total >= self.parallel_threshold):
+                    mode = 'parallel'
+                    run_parallel_export(mongo.connection_settings(), query, fileobj, self.parallel_workers,
+                                        progress=progress, batch_size=self.batch_size)
+                else:
+                    rows = self._rows(query, progress)
+                    if job['export_type'] == 'csv':
+                        write_csv_rows(rows, fileobj)
+                    else:
+                        write_excel_rows(rows, fileobj)
+        except Exception as exc:
+            if os.path.exists(path):
+                os.remove(path)
+            self._finish(job_id, 'failed', error=str(exc))
+            return
+        metrics.observe_export(job['export_type'], mode, total, os.path.getsize(path),
+                               time.perf_counter() - started)
+        self._finish(job_id, 'done', path=path, filename=filename, mimetype=mimetype)
+
+
+export_queue = ExportQueue()
@@ -0,0 +1,139 @@
+"""
+Aggregation-pipeline export engine (EXPORT_ENGINE=pipeline).
+
+The server builds the export rows: it projects only the exported fields,
+formats dates as DD-MM-YYYY, drops dependents for employees whose marital
+status does not export them, and unwinds `family_members` with its array
+index so that each result carries at most one dependent row. Only the first
+result of an employee carries the employee row. Python numbers the rows and
+adds the blank spacer rows. It patches the few values the server could not
+settle: dates in a format $dateFromString does not accept, and ages of
+dependents on profiles saved before the stored family view.
+
+The output is the same (kind, sr_no, row) stream as exporters.iter_export_rows,
+so it feeds the same CSV and Excel writers.
+"""
+from extensions import employees_collection
+from exporters import DEPENDENT_MARITAL_STATUSES
+from family import FAMILY_SCHEMA_VERSION
+from dates import format_date_ddmmyyyy
+from ages import age_label
+
+# Stored date formats the server can parse; anything else is finished in Python.
+_SERVER_DATE_FORMATS = ('%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y')
+
+
+def _value(path):
+    return {'$ifNull': [path, '']}
+
+
+def _date(path):
+    """DD-MM-YYYY for any server-parseable date; otherwise the stored value."""
+    parsed = None
+    for fmt in reversed(_SERVER_DATE_FORMATS):
+        attempt = {'$dateFromString': {'dateString': path, 'format': fmt, 'onError': None, 'onNull': None}}
+        parsed = attempt if parsed is None else {'$ifNull': [attempt, parsed]}
+    return {'$let': {
+        'vars': {'parsed': parsed},
+        'in': {'$cond': [
+            {'$eq': ['$$parsed', None]},
+            _value(path),
+            {'$dateToString': {'date': '$$parsed', 'format': '%d-%m-%Y'}}
+        ]}
+    }}
+
+
+def _blank(path):
+    """True where Python would treat the value as falsy."""
+    return {'$in': [{'$ifNull': [path, '']}, ['', 0, False]]}
+
+
+def build_export_pipeline(query):
+    exports_dependents = {'$in': [
+        {'$toLower': {'$trim': {'input': {'$ifNull': ['$marital_status', '']}}}},
+        DEPENDENT_MARITAL_STATUSES
+    ]}
+    dependent = {
+        'row': [
+            '', '', _value('$$m.name'), _date('$$m.date_of_birth'), _value('$$m.age'),
+            _value('$$m.relationship'), _value('$$m.gender'), '', '', '', '', '', '', '', ''
+        ],
+        # Profiles without the stored view get missing ages computed on export.
+        'age_dob': {'$cond': [
+            {'$and': [
+                {'$ne': ['$family_schema_version', FAMILY_SCHEMA_VERSION]},
+                _blank('$$m.age'),
+                {'$not': [_blank('$$m.date_of_birth')]}
+            ]},
+            '$$m.date_of_birth',
+            '$$REMOVE'
+        ]},
+    }
+    return [
+        {'$match': query},
+        {'$project': {
+            '_id': 0,
+            'employee': [
+                None, _value('$employee_id'), _value('$name'), _date('$dob'), _value('$age'), 'Employee',
+                _value('$gender'), _value('$designation'), _value('$phone'), _date('$date_of_joining'),
+                _value('$sum_insured_gmc'), _value('$sum_insured_gpa'), _value('$sum_insured_gtl'),
+                _value('$email'), _value('$marital_status')
+            ],
+            'dependents': {'$cond': [
+                exports_dependents,
+                {'$map': {'input': {'$ifNull': ['$family_members', []]}, 'as': 'm', 'in': dependent}},
+                []
+            ]},
+        }},
+        {'$unwind': {'path': '$dependents', 'includeArrayIndex': 'index', 'preserveNullAndEmptyArrays': True}},
+        {'$project': {
+            'employee': {'$cond': [{'$gt': ['$index', 0]}, '$$REMOVE', '$employee']},
+            'dependent': '$dependents.row',
+            'age_dob': '$dependents.age_dob',
+        }},
+    ]
+
+
+def _ddmmyyyy(value):
+    # The server already produced DD-MM-YYYY for everything it could parse.
+    if isinstance(value, str) and len(value) == 10 and value[2] == '-' and value[5] == '-':
+        return value
+    return format_date_ddmmyyyy(value)
+
+
+def iter_pipeline_rows(query, batch_size=500, start=1, progress=None, every=500):
+    """
+    Export rows for the employees matching `query`, built by the server.
+    `progress(count)` is called every `every` employees and at the end.
+    """
+    cursor = employees_collection.aggregate(build_export_pipeline(query), batchSize=batch_size)
+    sr_no = start - 1
+    count = 0
+    try:
+        for doc in cursor:
+            employee = doc.get('employee')
+            if employee is not None:
+                if count:
+                    yield 'blank', sr_no, [''] * 15
+                    yield 'blank', sr_no, [''] * 15
+                sr_no += 1
+                count += 1
+                employee[0] = sr_no
+                employee[3] = _ddmmyyyy(employee[3])
+                employee[9] = _ddmmyyyy(employee[9])
+                yield 'employee', sr_no, employee
+                if progress and count % every == 0:
+                    progress(count)
+            row = doc.get('dependent')
+            if row is not None:
+                row[3] = _ddmmyyyy(row[3])
+                if 'age_dob' in doc:
+                    row[4] = age_label(doc['age_dob'])
+                yield 'dependent', sr_no, row
+        if count:
+            yield 'blank', sr_no, [''] * 15
+            yield 'blank', sr_no, [''] * 15
+    finally:
+        cursor.close()
+    if progress:
+        progress(count)
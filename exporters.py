@@ -0,0 +1,259 @@
+"""
+Roster export writers shared by the export routes and the background export
+queue. Nothing here depends on a request context: callers pass in the
+employee iterable, the destination and the tuning values.
+"""
+import csv
+import io
+from family import normalize_family
+from search import build_search_query
+from dates import format_date_ddmmyyyy
+from records import PROFILES
+
+EXPORT_HEADERS = [
+    'Sr. No', 'Employee Code', 'Name of Employee/Dependent', 'DOB', 'Age', 'Relation', 'Gender',
+    'Designation', 'Contact No.', 'Date of Joining',
+    'Sum Insured - GMC', 'Sum Insured - GPA', 'Sum Insured - GTL', 'Email ID', 'Marital Status'
+]
+
+# Only the fields the export writes; keeps password hashes and form leftovers off the wire.
+# Exports stream plain documents: each one is flattened and dropped at once.
+EXPORT_PROJECTION = PROFILES['export']
+
+EXCEL_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Dependents are only exported for employees with one of these statuses.
+DEPENDENT_MARITAL_STATUSES = ['married', 'widowed', 'divorced']
+
+
+def build_export_query(search='', selected_ids=None):
+    """Selected employee codes win over the search term; admin is never exported."""
+    query = {'role': {'$ne': 'admin'}}
+    selected_ids = [eid for eid in (selected_ids or []) if eid]
+    if selected_ids:
+        query['employee_id'] = {'$in': selected_ids}
+    elif search:
+        query.update(build_search_query(search))
+    return query
+
+
+def track_progress(employees, callback, every=500):
+    """Pass employees through, calling callback(count) every `every` and at the end."""
+    count = 0
+    try:
+        for emp in employees:
+            yield emp
+            count += 1
+            if count % every == 0:
+                callback(count)
+    finally:
+        _close(employees)
+    callback(count)
+
+
+def _close(employees):
+    close = getattr(employees, 'close', None)
+    if close:
+        close()
+
+
+def iter_export_rows(employees, start=1):
+    """
+    Flatten employees into export rows, one employee at a time.
+
+    Yields (kind, sr_no, row) where kind is 'employee', 'dependent' or 'blank'.
+    Numbering begins at `start`, so a shard of a larger export can continue
+    the overall Sr. No sequence. The source cursor is closed when done.
+    """
+    sr_no = start
+    try:
+        for emp in employees:
+            emp = normalize_family(emp)
+            yield 'employee', sr_no, [
+                sr_no,
+                emp.get('employee_id', ''),
+                emp.get('name', ''),
+                format_date_ddmmyyyy(emp.get('dob', '')),
+                emp.get('age', ''),
+                'Employee',
+                emp.get('gender', ''),
+                emp.get('designation', ''),
+                emp.get('phone', ''),
+                format_date_ddmmyyyy(emp.get('date_of_joining', '')),
+                emp.get('sum_insured_gmc', ''),
+                emp.get('sum_insured_gpa', ''),
+                emp.get('sum_insured_gtl', ''),
+                emp.get('email', ''),
+                emp.get('marital_status', '')
+            ]
+            if emp.get('marital_status', '').strip().lower() in DEPENDENT_MARITAL_STATUSES:
+                for member in emp.get('family_members', []):
+                    yield 'dependent', sr_no, [
+                        '', '', member.get('name', ''),
+                        format_date_ddmmyyyy(member.get('date_of_birth', '')),
+                        member.get('age', ''),
+                        member.get('relationship', ''),
+                        member.get('gender', ''), '', '', '', '', '', '', '', ''
+                    ]
+            yield 'blank', sr_no, [''] * 15
+            yield 'blank', sr_no, [''] * 15
+            sr_no += 1
+    finally:
+        _close(employees)
+
+
+def csv_row_chunks(rows, chunk_rows=200, header=True):
+    """
+    CSV text for already flattened (kind, sr_no, row) tuples, in chunks of
+    `chunk_rows` rows (the header, when wanted, is its own first chunk).
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_HEADERS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    pending = 0
+    for _kind, _sr_no, row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
+
+
+def write_csv(employees, fileobj, chunk_rows=200):
+    """Write the nested CSV to a binary file object as UTF-8."""
+    write_csv_rows(iter_export_rows(employees), fileobj, chunk_rows)
+
+
+def write_csv_rows(rows, fileobj, chunk_rows=200):
+    """Same, from already flattened (kind, sr_no, row) tuples."""
+    for chunk in csv_row_chunks(rows, chunk_rows):
+        fileobj.write(chunk.encode('utf-8'))
+
+
+def write_excel_styled_rows(rows, fileobj):
+    """In-memory workbook from already flattened (kind, sr_no, row) tuples."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.styles.borders import Border, Side
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Employee Data"
+
+    header_fill = PatternFill(start_color='042351', end_color='042351', fill_type='solid')
+    header_font = Font(color='FFFFFF', bold=True)
+    align_center = Alignment(horizontal='center', vertical='center')
+
+    for col_num, header in enumerate(EXPORT_HEADERS, 1):
+        cell = ws.cell(row=1, column=col_num, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = align_center
+        ws.column_dimensions[get_column_letter(col_num)].width = 20
+
+    row = 2
+    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    fill_white = PatternFill(start_color='FFFFFF', end_color='FFFFFF', fill_type='solid')
+    fill_gray = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
+    indent = Alignment(indent=1)
+
+    for kind, sr_no, values in rows:
+        ws.append(values)
+        if kind != 'blank':
+            fill = fill_white if sr_no % 2 != 0 else fill_gray
+            if kind == 'dependent':
+                ws[f'C{row}'].alignment = indent
+            for col in range(1, 16):
+                cell = ws.cell(row=row, column=col)
+                cell.fill = fill
+                cell.border = thin_border
+        row += 1
+
+    wb.save(fileobj)
+
+
+def _register_export_styles(wb):
+    """
+    Add the export's named styles to a workbook once, so every cell only
+    references a style instead of carrying its own fill/border objects.
+    """
+    from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
+    from openpyxl.styles.borders import Border, Side
+
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    wb.add_named_style(NamedStyle(
+        name='export_header',
+        font=Font(color='FFFFFF', bold=True),
+        fill=PatternFill(start_color='042351', end_color='042351', fill_type='solid'),
+        alignment=Alignment(horizontal='center', vertical='center')
+    ))
+    for shade, color in (('white', 'FFFFFF'), ('gray', 'D3D3D3')):
+        fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
+        wb.add_named_style(NamedStyle(name=f'export_{shade}', fill=fill, border=border))
+        wb.add_named_style(NamedStyle(
+            name=f'export_{shade}_indent', fill=fill, border=border, alignment=Alignment(indent=1)
+        ))
+
+
+def _styled_row(ws, values, style, indent_col=None):
+    from openpyxl.cell import WriteOnlyCell
+
+    cells = []
+    for col, value in enumerate(values):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = f'{style}_indent' if col == indent_col else style
+        cells.append(cell)
+    return cells
+
+
+def write_excel_streaming(employees, fileobj):
+    """
+    High-volume Excel engine.
+
+    Writes through a write-only worksheet so rows are flushed as they are
+    appended and styles each cell with a pre-registered named style. Pass a
+    temporary file rather than an in-memory buffer. The output looks the same
+    as write_excel_styled_rows.
+    """
+    write_excel_rows(iter_export_rows(employees), fileobj)
+
+
+def write_excel_rows(rows, fileobj):
+    """Write-only workbook from already flattened (kind, sr_no, row) tuples."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Employee Data")
+    _register_export_styles(wb)
+
+    for col_num in range(1, len(EXPORT_HEADERS) + 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = 20
+
+    header = []
+    for title in EXPORT_HEADERS:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.style = 'export_header'
+        header.append(cell)
+    ws.append(header)
+
+    for kind, sr_no, values in rows:
+        if kind == 'blank':
+            ws.append(values)
+            continue
+        style = 'export_white' if sr_no % 2 != 0 else 'export_gray'
+        ws.append(_styled_row(ws, values, style, indent_col=2 if kind == 'dependent' else None))
+
+    wb.save(fileobj)
@@ -1,18 +1,147 @@
+import threading
 from flask_wtf import CSRFProtect
-from flask_assets import Environment
-from pymongo import MongoClient
-import os
+from pymongo import MongoClient, monitoring
+from werkzeug.local import LocalProxy
+
 # Extensions
 csrf = CSRFProtect()
-assets = Environment()
 
-# MongoDB
-# client = MongoClient("mongodb://localhost:27017/employee_management")
-# db = client['employee_management']
-# employees_collection = db['employees']
 
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters, summed over every server the client talks to."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkout_failures = 0
+        self.clears = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'open': self.created - self.closed,
+                'created': self.created,
+                'closed': self.closed,
+                'checked_out': self.checked_out,
+                'max_checked_out': self.max_checked_out,
+                'checkout_failures': self.checkout_failures,
+                'pool_clears': self.clears,
+            }
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.clears += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
 
-mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/employee_management")
-client = MongoClient(mongo_uri)
-db = client['employee_management']
-employees_collection = db['employees']
+
+def client_options(config):
+    """MongoClient keyword arguments from the MONGO_* settings."""
+    options = {
+        'maxPoolSize': config['MONGO_MAX_POOL_SIZE'],
+        'minPoolSize': config['MONGO_MIN_POOL_SIZE'],
+        'waitQueueTimeoutMS': config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+        'connectTimeoutMS': config['MONGO_CONNECT_TIMEOUT_MS'],
+        'serverSelectionTimeoutMS': config['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+        'readPreference': config['MONGO_READ_PREFERENCE'],
+    }
+    if config['MONGO_COMPRESSORS']:
+        options['compressors'] = config['MONGO_COMPRESSORS']
+    if config['MONGO_WRITE_CONCERN']:
+        w = config['MONGO_WRITE_CONCERN']
+        options['w'] = int(w) if w.isdigit() else w
+    return options
+
+
+class Mongo:
+    """
+    The process-wide MongoClient, configured from the app config by init_app.
+
+    The client is only constructed when something first touches `client` or
+    `db`, so creating the app never waits on the network.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._uri = None
+        self._options = None
+        self._db_name = None
+        self._lock = threading.Lock()
+        self.pool_stats = PoolStats()
+        self.listeners = [self.pool_stats]
+
+    def init_app(self, app, client=None):
+        self._uri = app.config['MONGO_URI']
+        self._options = client_options(app.config)
+        self._db_name = app.config['MONGO_DB_NAME']
+        self._client = client
+        app.extensions['mongo'] = self
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    if self._uri is None:
+                        raise RuntimeError('Mongo.init_app() has not been called.')
+                    self._client = MongoClient(self._uri, event_listeners=list(self.listeners), **self._options)
+        return self._client
+
+    def add_listener(self, listener):
+        """Attach a pymongo event listener; only takes effect if the client is not created yet."""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    @property
+    def db(self):
+        return self.client[self._db_name]
+
+    def connection_settings(self):
+        """What another process needs to open its own client to the same database."""
+        return {'uri': self._uri, 'options': dict(self._options), 'db_name': self._db_name}
+
+
+mongo = Mongo()
+
+# MongoDB
+employees_collection = LocalProxy(lambda: mongo.db['employees'])
+export_jobs_collection = LocalProxy(lambda: mongo.db['export_jobs'])
+roster_stats_collection = LocalProxy(lambda: mongo.db['roster_stats'])
+employee_tombstones_collection = LocalProxy(lambda: mongo.db['employee_tombstones'])
@@ -0,0 +1,112 @@
+"""
+Derived family view of an employee: `spouse`, `children` and `parents`
+buckets (with ages) built from `family_members`.
+
+The view is computed once when a profile is saved and stored on the document
+with `family_schema_version`. Documents written before that carry no version;
+they are upgraded on first read (or in bulk with `flask family backfill`).
+"""
+import click
+from flask.cli import AppGroup
+from pymongo import UpdateOne
+from extensions import employees_collection
+from ages import ages_for
+from cache import employee_cache
+
+FAMILY_SCHEMA_VERSION = 1
+
+
+def family_view(family):
+    """
+    Build the stored family fields from a family_members list.
+    Missing ages are filled in place for members with a date of birth.
+    """
+    missing = [m for m in family if not m.get('age') and m.get('date_of_birth')]
+    for m, age in zip(missing, ages_for([m['date_of_birth'] for m in missing])):
+        m['age'] = age
+
+    spouse = {'name': '', 'date_of_birth': '', 'phone': '', 'gender': '', 'age': ''}
+    children = []
+    parents = []
+    for member in family:
+        rel = member.get('relationship', '')
+        name = member.get('name', '')
+        dob = member.get('date_of_birth', '')
+        gender = member.get('gender', '')
+        age = member.get('age') or ''
+        if rel == 'Spouse':
+            spouse = {
+                'name': name,
+                'date_of_birth': dob,
+                'phone': member.get('phone', ''),
+                'gender': gender,
+                'age': age
+            }
+        elif rel == 'Child':
+            children.append({
+                'name': name,
+                'date_of_birth': dob,
+                'phone': member.get('phone', ''),
+                'gender': gender,
+                'age': age
+            })
+        elif rel in ['Mother', 'Father']:
+            parents.append({
+                'relationship': rel,
+                'name': name,
+                'date_of_birth': dob,
+                'age': age
+            })
+    return {
+        'family_members': family,
+        'spouse': spouse,
+        'children': children,
+        'parents': parents,
+        'family_schema_version': FAMILY_SCHEMA_VERSION
+    }
+
+
+def normalize_family(emp, persist=False):
+    """
+    Make sure `emp` carries the current family view.
+
+    Up-to-date documents are returned untouched. Older ones are upgraded in
+    memory and, with persist=True, written back so the next read is free.
+    """
+    if emp.get('family_schema_version') == FAMILY_SCHEMA_VERSION:
+        return emp
+    view = family_view(emp.get('family_members', []))
+    emp.update(view)
+    if persist and emp.get('_id') is not None and emp.get('family_members'):
+        employees_collection.update_one({'_id': emp['_id']}, {'$set': view})
+        employee_cache.invalidate(emp['_id'], emp.get('employee_id'))
+    return emp
+
+
+def backfill(batch_size=500):
+    """Store the family view on every profile that lacks the current version. Returns the count."""
+    query = {
+        'family_members': {'$exists': True},
+        'family_schema_version': {'$ne': FAMILY_SCHEMA_VERSION}
+    }
+    updated = 0
+    batch = []
+    for emp in employees_collection.find(query, {'family_members': 1}).batch_size(batch_size):
+        batch.append(UpdateOne({'_id': emp['_id']}, {'$set': family_view(emp.get('family_members', []))}))
+        if len(batch) >= batch_size:
+            updated += employees_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += employees_collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+family_cli = AppGroup('family', help='Maintain stored family views.')
+
+
+@family_cli.command('backfill')
+@click.option('--batch-size', default=500, show_default=True)
+def backfill_command(batch_size):
+    """Upgrade existing profiles to the current family schema."""
+    updated = backfill(batch_size=batch_size)
+    click.echo(f'Upgraded {updated} profile(s) to family schema v{FAMILY_SCHEMA_VERSION}.')
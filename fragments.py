@@ -0,0 +1,119 @@
+"""
+Template caches.
+
+Compiled templates are kept in a Jinja bytecode cache on disk
+(JINJA_BYTECODE_CACHE_DIR, default <instance>/jinja_cache). A new worker loads
+them from there instead of compiling every template again. Entries are
+checked against the template source, so an edited template is recompiled.
+
+Rendered fragments (admin roster rows, profile form sections) are kept in a
+bounded in-process LRU. The key is the fragment name, the employee's _id
+and revision, and the variant arguments. Every employee write stamps a new
+revision (revisions.stamp), so a key never names stale HTML and nothing has
+to be invalidated.
+
+Edits made directly in the database without a new revision are not seen
+until the entry is evicted or the process restarts. Employees without a
+revision (saved before change tracking, until `flask revisions backfill`)
+are rendered every time. So is everything while templates auto-reload
+(debug), because the key does not cover the template source.
+
+A fragment must not contain per-request values. Templates write `csrf_slot`
+where the CSRF token goes, and the token is filled in when the fragment is
+served.
+"""
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from flask import current_app
+from flask_wtf.csrf import generate_csrf
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+CSRF_SLOT = f'csrf-slot-{secrets.token_hex(8)}'
+
+
+class FragmentStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+        self.evictions = 0
+
+    def snapshot(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'uncached': self.uncached,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+            'evictions': self.evictions,
+        }
+
+
+def _field(employee, name):
+    if isinstance(employee, dict):
+        return employee.get(name)
+    return getattr(employee, name, None)
+
+
+class FragmentCache:
+    def __init__(self):
+        self.enabled = True
+        self.max_entries = 10000
+        self.stats = FragmentStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config['FRAGMENT_CACHE_ENABLED']
+        self.max_entries = config['FRAGMENT_CACHE_SIZE']
+        if config['JINJA_BYTECODE_CACHE']:
+            directory = config['JINJA_BYTECODE_CACHE_DIR'] or os.path.join(app.instance_path, 'jinja_cache')
+            os.makedirs(directory, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+        app.add_template_global(self.render, 'fragment')
+        app.add_template_global(CSRF_SLOT, 'csrf_slot')
+        self.clear()
+        app.extensions['fragment_cache'] = self
+
+    def render(self, name, employee, macro, *variant):
+        """`macro(employee, *variant)`, from the cache while the employee's revision is unchanged."""
+        revision = _field(employee, 'revision')
+        if not self.enabled or revision is None or current_app.jinja_env.auto_reload:
+            self.stats.uncached += 1
+            html = str(macro(employee, *variant))
+        else:
+            key = (name, str(_field(employee, '_id')), revision, variant)
+            with self._lock:
+                html = self._entries.get(key)
+                if html is not None:
+                    self._entries.move_to_end(key)
+            if html is None:
+                self.stats.misses += 1
+                html = str(macro(employee, *variant))
+                self._store(key, html)
+            else:
+                self.stats.hits += 1
+        if CSRF_SLOT in html:
+            html = html.replace(CSRF_SLOT, generate_csrf())
+        return Markup(html)
+
+    def _store(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,321 @@
+"""
+Bulk employee import.
+
+Reads the nested layout the exports produce (CSV or .xlsx): an employee row
+carries a Sr. No, and the dependent rows under it leave Sr. No blank. Rows
+are parsed as a stream, grouped into employees and validated with the
+complete_profile rules. Phones already owned by another employee are found
+with one query per batch rather than one per row. Valid employees are upserted by
+employee_id with unordered bulk_write. Every rejected employee is reported
+with the file line it starts on.
+
+New employees are created with role 'user' and no password, so they cannot
+log in yet. Each employee onboards by registering with the imported phone,
+which sets a password on the existing profile (auth._claim_imported).
+Alternatively an admin sets one from the employee's change-password page.
+"""
+import csv
+import io
+import re
+import time
+from datetime import date, datetime
+import click
+from flask.cli import AppGroup
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from extensions import employees_collection
+from exporters import EXPORT_HEADERS
+from family import family_view
+from search import search_keys
+from dates import parse_date
+from ages import ages_for
+from cache import employee_cache
+from stats import STATS_PROJECTION, apply as apply_stats, diff as stats_diff
+from revisions import stamp_many
+
+IMPORT_BATCH_SIZE = 1000
+
+_EMAIL_RE = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
+
+# Export column -> employee field, for the employee row.
+_EMPLOYEE_COLUMNS = {
+    1: 'employee_id', 2: 'name', 3: 'dob', 6: 'gender', 7: 'designation', 8: 'phone',
+    9: 'date_of_joining', 10: 'sum_insured_gmc', 11: 'sum_insured_gpa', 12: 'sum_insured_gtl',
+    13: 'email', 14: 'marital_status'
+}
+_RELATIONSHIPS = {'spouse': 'Spouse', 'child': 'Child', 'mother': 'Mother', 'father': 'Father'}
+# Children are only kept for these statuses (the export writes the last two).
+_MARITAL_WITH_CHILDREN = ('married', 'divorced/widowed', 'divorced', 'widowed')
+
+
+class ImportReport:
+    """Outcome of one import run."""
+
+    def __init__(self):
+        self.rows = 0
+        self.employees = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def error(self, line, employee_id, message):
+        self.errors.append({'line': line, 'employee_id': employee_id, 'message': message})
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.elapsed) if self.elapsed else 0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def read_rows(fileobj, filename):
+    """
+    Yield (line_no, values) for every data row of an uploaded file, padded to
+    the export's 15 columns. Raises ValueError for an unknown file type or
+    header.
+    """
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        try:
+            yield from _data_rows(csv.reader(text))
+        finally:
+            # Leave the caller's file open.
+            text.detach()
+    elif name.endswith('.xlsx'):
+        from openpyxl import load_workbook
+        wb = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            yield from _data_rows(wb.worksheets[0].iter_rows(values_only=True))
+        finally:
+            wb.close()
+    else:
+        raise ValueError('Upload a .csv or .xlsx file.')
+
+
+def _data_rows(rows):
+    width = len(EXPORT_HEADERS)
+    header = [_cell(v) for v in next(rows, [])][:width]
+    if header != EXPORT_HEADERS:
+        raise ValueError('The file does not have the export column layout.')
+    for line_no, row in enumerate(rows, 2):
+        values = [_cell(v) for v in row][:width]
+        yield line_no, values + [''] * (width - len(values))
+
+
+def iter_records(rows):
+    """Group rows into (line_no, employee_values, [(line_no, dependent_values), ...])."""
+    current = None
+    for line_no, values in rows:
+        if values[0] or values[1]:
+            if current:
+                yield current
+            current = (line_no, values, [])
+        elif any(values):
+            if current is None:
+                yield line_no, None, [(line_no, values)]
+                continue
+            current[2].append((line_no, values))
+    if current:
+        yield current
+
+
+def validate_record(record):
+    """Return (document, None) for a valid record, or (None, error message)."""
+    line_no, values, dependents = record
+    if values is None:
+        return None, 'Dependent row without an employee above it.'
+
+    doc = {field: values[col] for col, field in _EMPLOYEE_COLUMNS.items()}
+    if not doc['employee_id']:
+        return None, 'Employee ID is required.'
+    if not doc['phone'].isdigit() or len(doc['phone']) != 10:
+        return None, 'Phone number must be exactly 10 digits.'
+    if not _EMAIL_RE.match(doc['email']):
+        return None, 'Invalid email format.'
+    for key in ('dob', 'date_of_joining'):
+        if doc[key]:
+            parsed = parse_date(doc[key])
+            if parsed is None:
+                return None, f"Unrecognised date '{doc[key]}'."
+            doc[key] = parsed.isoformat()
+    doc['marital_status'] = doc['marital_status'].lower()
+
+    family = []
+    family_names = set()
+    seen_rels = set()
+    for dep_line, dep in dependents:
+        name, dob, rel, gender = dep[2], dep[3], _RELATIONSHIPS.get(dep[5].lower()), dep[6]
+        if rel is None:
+            return None, f"Line {dep_line}: unknown relationship '{dep[5]}'."
+        if dob:
+            parsed = parse_date(dob)
+            if parsed is None:
+                return None, f"Line {dep_line}: unrecognised date '{dob}'."
+            dob = parsed.isoformat()
+        if name.lower() in family_names:
+            return None, f"Duplicate family member name '{name}' is not allowed."
+        member = {'relationship': rel, 'name': name, 'date_of_birth': dob, 'age': ''}
+
+        if rel == 'Spouse':
+            if doc['marital_status'] != 'married':
+                return None, 'Spouse listed for an employee who is not married.'
+            if 'Spouse' in seen_rels:
+                return None, 'Only one spouse is allowed.'
+            if not name or not dob or not gender:
+                return None, 'All spouse details are required for married employees.'
+            seen_rels.add('Spouse')
+            member.update(phone='', gender=gender)
+        elif rel == 'Child':
+            if doc['marital_status'] not in _MARITAL_WITH_CHILDREN:
+                return None, 'Children listed for an unmarried employee.'
+            if not name or not dob or not gender:
+                return None, f"Line {dep_line}: all child fields are required."
+            member.update(phone='', gender=gender)
+        else:
+            if rel in seen_rels:
+                return None, f"Duplicate parent relationship '{rel}' is not allowed."
+            seen_rels.add(rel)
+        family_names.add(name.lower())
+        family.append(member)
+
+    if doc['marital_status'] == 'married' and 'Spouse' not in seen_rels:
+        return None, 'All spouse details are required for married employees.'
+
+    doc.update(family_view(family))
+    doc['details_completed'] = True
+    return doc, None
+
+
+def _conflicts(docs):
+    """Employees whose phone already belongs to a different employee_id, in one query."""
+    phones = [doc['phone'] for doc in docs]
+    owners = {
+        emp['phone']: emp.get('employee_id')
+        for emp in employees_collection.find({'phone': {'$in': phones}}, {'phone': 1, 'employee_id': 1})
+    }
+    return {doc['employee_id'] for doc in docs
+            if doc['phone'] in owners and owners[doc['phone']] != doc['employee_id']}
+
+
+def _write_batch(batch, report):
+    """Upsert one batch of (line_no, doc) pairs with a single unordered bulk_write."""
+    conflicts = _conflicts([doc for _, doc in batch])
+    pending = []
+    for line_no, doc in batch:
+        if doc['employee_id'] in conflicts:
+            report.error(line_no, doc['employee_id'], 'An account with this phone already exists.')
+        else:
+            pending.append((line_no, doc))
+    if not pending:
+        return
+
+    for (_, doc), age in zip(pending, ages_for([doc['dob'] for _, doc in pending])):
+        doc['age'] = age
+        doc['search_keys'] = search_keys(doc)
+    stamp_many([doc for _, doc in pending])
+    ids = [doc['employee_id'] for _, doc in pending]
+    before = {emp['employee_id']: emp for emp in employees_collection.find(
+        {'employee_id': {'$in': ids}, 'role': {'$ne': 'admin'}}, dict(STATS_PROJECTION, employee_id=1)
+    )}
+    requests = [
+        UpdateOne(
+            {'employee_id': doc['employee_id'], 'role': {'$ne': 'admin'}},
+            {'$set': doc, '$setOnInsert': {'role': 'user'}},
+            upsert=True
+        )
+        for _, doc in pending
+    ]
+    failed = set()
+    try:
+        result = employees_collection.bulk_write(requests, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as exc:
+        details = exc.details
+        for failure in details.get('writeErrors', []):
+            failed.add(failure['index'])
+            line_no, doc = pending[failure['index']]
+            message = failure.get('errmsg', 'Write failed.')
+            if failure.get('code') == 11000:
+                message = 'Employee ID or phone already exists.'
+            report.error(line_no, doc['employee_id'], message)
+    # New employees were never cached; existing ones are dropped by _id.
+    employee_cache.invalidate([emp['_id'] for emp in before.values()], ids)
+    delta = {}
+    for index, (_, doc) in enumerate(pending):
+        if index not in failed:
+            old = before.get(doc['employee_id'])
+            for path, amount in stats_diff(old, {**(old or {}), **doc}).items():
+                delta[path] = delta.get(path, 0) + amount
+    apply_stats({path: amount for path, amount in delta.items() if amount})
+    report.inserted += details.get('nUpserted', 0)
+    report.updated += details.get('nMatched', 0)
+
+
+def import_employees(fileobj, filename, batch_size=IMPORT_BATCH_SIZE):
+    """Import an export-layout file. Returns an ImportReport."""
+    report = ImportReport()
+
+    def counted(rows):
+        for row in rows:
+            report.rows += 1
+            yield row
+
+    seen_ids = set()
+    seen_phones = set()
+    batch = []
+    for record in iter_records(counted(read_rows(fileobj, filename))):
+        report.employees += 1
+        line_no, values = record[0], record[1]
+        doc, error = validate_record(record)
+        if error is None and doc['employee_id'] in seen_ids:
+            error = 'Employee ID appears more than once in the file.'
+        elif error is None and doc['phone'] in seen_phones:
+            error = 'Phone number appears more than once in the file.'
+        if error:
+            report.error(line_no, values[1] if values else '', error)
+            continue
+        seen_ids.add(doc['employee_id'])
+        seen_phones.add(doc['phone'])
+        batch.append((line_no, doc))
+        if len(batch) >= batch_size:
+            _write_batch(batch, report)
+            batch = []
+    if batch:
+        _write_batch(batch, report)
+    report.errors.sort(key=lambda e: e['line'])
+    return report.finish()
+
+
+import_cli = AppGroup('employees', help='Bulk employee maintenance.')
+
+
+@import_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+def import_command(path, batch_size):
+    """Import employees from an export-layout CSV or XLSX file."""
+    with open(path, 'rb') as fileobj:
+        report = import_employees(fileobj, path, batch_size=batch_size)
+    for error in report.errors:
+        click.echo(f"line {error['line']} [{error['employee_id']}]: {error['message']}", err=True)
+    click.echo(
+        f'{report.employees} employee(s): {report.inserted} inserted, {report.updated} updated, '
+        f'{len(report.errors)} rejected in {report.elapsed:.1f}s ({report.rows_per_second} rows/s).'
+    )
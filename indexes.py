@@ -0,0 +1,170 @@
+import click
+from flask.cli import AppGroup
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from extensions import employees_collection, export_jobs_collection, employee_tombstones_collection
+from search import build_search_query
+
+# Declared indexes for the employees collection. Names are fixed so that
+# ensure/verify can match them against what the server reports.
+EMPLOYEE_INDEXES = [
+    # Login and registration lookups; one account per phone number.
+    IndexModel([('phone', ASCENDING)], name='phone_unique', unique=True),
+    # Profile lookups and the complete_profile conflict check. Sparse because
+    # freshly registered users have no employee_id until they finish the form.
+    IndexModel([('employee_id', ASCENDING)], name='employee_id_unique', unique=True, sparse=True),
+    # Admin account lookup and the role != admin roster filter.
+    IndexModel([('role', ASCENDING)], name='role'),
+    # Roster search (see search.py); multikey over normalized values and prefixes.
+    IndexModel([('search_keys', ASCENDING)], name='search_keys'),
+    # Delta export: changes since a revision watermark (see revisions.py).
+    IndexModel([('revision', ASCENDING)], name='revision'),
+]
+
+# Deleted employees, read by the delta export in revision order.
+TOMBSTONE_INDEXES = [
+    IndexModel([('revision', ASCENDING)], name='revision'),
+]
+
+# Background export jobs (see export_jobs.py). At most one queued/running job
+# per request fingerprint; finished jobs drop `active` and leave the index.
+# Expired finished jobs are found by `finished_at` and swept.
+EXPORT_JOB_INDEXES = [
+    IndexModel([('fingerprint', ASCENDING)], name='active_fingerprint_unique', unique=True,
+               partialFilterExpression={'active': True}),
+    IndexModel([('finished_at', ASCENDING)], name='finished_at', sparse=True),
+]
+
+# Indexes an earlier release declared that cost writes and serve no query;
+# ensure_indexes drops them. name_ci had a collation no query passed.
+RETIRED_EMPLOYEE_INDEXES = ['name_ci']
+
+# Hot queries whose plans `flask indexes usage` reports.
+HOT_QUERIES = {
+    'auth.login (phone)': {'phone': '0000000000'},
+    'auth.login (admin)': {'role': 'admin'},
+    'main.employee_detail (employee_id)': {'employee_id': 'admin'},
+    'admin.admin_dashboard (search)': build_search_query('admin'),
+    'export.delta (revision)': {'revision': {'$gt': 0}},
+}
+
+
+def _declared_indexes():
+    return [
+        (employees_collection, EMPLOYEE_INDEXES),
+        (export_jobs_collection, EXPORT_JOB_INDEXES),
+        (employee_tombstones_collection, TOMBSTONE_INDEXES),
+    ]
+
+
+def ensure_indexes():
+    """
+    Create any declared index that is missing. Safe to call repeatedly:
+    the server treats an identical existing index as a no-op.
+    """
+    names = []
+    for collection, models in _declared_indexes():
+        names.extend(collection.create_indexes(models))
+    existing = employees_collection.index_information()
+    for name in RETIRED_EMPLOYEE_INDEXES:
+        if name in existing:
+            employees_collection.drop_index(name)
+    return names
+
+
+def verify_indexes():
+    """
+    Compare declared indexes with the server.
+    Returns (missing, mismatched) lists of index names.
+    """
+    missing, mismatched = [], []
+    for collection, models in _declared_indexes():
+        existing = collection.index_information()
+        for model in models:
+            spec = model.document
+            name = f"{collection.name}.{spec['name']}"
+            current = existing.get(spec['name'])
+            if current is None:
+                missing.append(name)
+            elif current.get('key') != list(spec['key'].items()) or \
+                    bool(current.get('unique')) != bool(spec.get('unique')):
+                mismatched.append(name)
+    return missing, mismatched
+
+
+def index_usage():
+    """Per-index access counters since the server last started."""
+    return [
+        {'name': stat['name'], 'ops': stat['accesses']['ops'], 'since': stat['accesses']['since']}
+        for stat in employees_collection.aggregate([{'$indexStats': {}}])
+    ]
+
+
+def _plan_stages(plan):
+    stages = []
+    while plan:
+        stage = plan.get('stage', '')
+        if plan.get('indexName'):
+            stage = f"{stage}({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get('inputStage')
+    return stages
+
+
+def explain_hot_queries():
+    """Winning plan stages for each hot query, e.g. ['FETCH', 'IXSCAN(phone_unique)']."""
+    plans = {}
+    for label, query in HOT_QUERIES.items():
+        planner = employees_collection.find(query).limit(1).explain().get('queryPlanner', {})
+        winning = planner.get('winningPlan', {})
+        plans[label] = _plan_stages(winning.get('queryPlan', winning))
+    return plans
+
+
+def init_indexes(app):
+    """Build indexes during bootstrap when MONGO_ENSURE_INDEXES is on."""
+    if not app.config['MONGO_ENSURE_INDEXES']:
+        return
+    try:
+        ensure_indexes()
+    except OperationFailure as exc:
+        # Usually duplicate phones/employee IDs in existing data; the app
+        # still works, just without the index. `flask indexes verify` reports it.
+        app.logger.warning('Could not build employee indexes: %s', exc)
+
+
+indexes_cli = AppGroup('indexes', help='Manage MongoDB indexes.')
+
+
+@indexes_cli.command('ensure')
+def ensure_command():
+    """Create any missing indexes."""
+    try:
+        names = ensure_indexes()
+    except OperationFailure as exc:
+        raise click.ClickException(f'Index build failed: {exc}')
+    click.echo(f"Indexes present: {', '.join(names)}")
+
+
+@indexes_cli.command('verify')
+def verify_command():
+    """Check declared indexes against the server."""
+    missing, mismatched = verify_indexes()
+    for name in missing:
+        click.echo(f'missing:    {name}')
+    for name in mismatched:
+        click.echo(f'mismatched: {name}')
+    if missing or mismatched:
+        raise click.ClickException('Indexes out of date; run `flask indexes ensure`.')
+    click.echo(f'All {sum(len(models) for _, models in _declared_indexes())} indexes present.')
+
+
+@indexes_cli.command('usage')
+def usage_command():
+    """Report index access counts and plans for hot queries."""
+    for stat in index_usage():
+        click.echo(f"{stat['name']:<24} {stat['ops']:>10} ops since {stat['since']:%Y-%m-%d %H:%M}")
+    click.echo('')
+    for label, stages in explain_hot_queries().items():
+        flag = '' if any(s.startswith('IXSCAN') for s in stages) else '   <-- collection scan'
+        click.echo(f"{label:<36} {' <- '.join(stages)}{flag}")
@@ -0,0 +1,302 @@
+"""
+Request, MongoDB and export metrics in the Prometheus text format.
+
+Enabled with METRICS_ENABLED=1. When off, init_app registers no hooks,
+no command listener and no /metrics route, and the observe_* helpers
+return at once, so the cost is one attribute check per export.
+
+  app_request_duration_seconds    per endpoint, until the body is sent
+  app_request_mongo_commands      Mongo round-trips per request
+  mongo_command_duration_seconds  per command and collection
+  export_rows_total / export_bytes_total / export_duration_seconds
+  employee_cache_* and mongo_pool_*  read from the cache and pool counters
+
+Commands slower than MONGO_SLOW_QUERY_MS are logged with the shape of their
+filter (values replaced by '?'), never the values themselves.
+
+/metrics, like /health/pool and /health/cache, answers a bearer
+METRICS_TOKEN or an admin session (see `operator_allowed`).
+"""
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, abort, current_app, request, session
+from pymongo import monitoring
+from extensions import mongo
+from cache import employee_cache
+
+slow_query_log = logging.getLogger('employee_app.slow_query')
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+EXPORT_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+# Commands whose filter is worth logging, and the key it lives under.
+_FILTER_KEYS = {
+    'find': 'filter', 'count': 'query', 'distinct': 'query', 'findAndModify': 'query',
+    'delete': 'deletes', 'update': 'updates', 'aggregate': 'pipeline',
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=REQUEST_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                # per-bucket counts (last one is +Inf), sum
+                series = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labelvalues, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = _labels(self.labelnames, labelvalues, [('le', _number(bound))])
+                    lines.append(f'{self.name}_bucket{le} {cumulative}')
+                labels = _labels(self.labelnames, labelvalues)
+                lines.append(f'{self.name}_sum{labels} {_number(total)}')
+                lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+def filter_shape(value):
+    """The structure of a filter with every literal replaced by '?'."""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = filter_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return '?'
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every command and counts them against the current request."""
+
+    def __init__(self, owner):
+        self.owner = owner
+        self._pending = {}
+
+    def started(self, event):
+        key = _FILTER_KEYS.get(event.command_name)
+        if key is not None:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.command.get(event.command_name), event.command.get(key)
+            )
+        self.owner.count_command()
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self.owner.mongo_failures.inc(event.command_name)
+        self._finish(event)
+
+    def _finish(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        collection = pending[0] if pending and isinstance(pending[0], str) else ''
+        seconds = event.duration_micros / 1e6
+        self.owner.mongo_duration.observe(seconds, event.command_name, collection)
+        if pending and seconds * 1000 >= self.owner.slow_query_ms:
+            slow_query_log.warning(
+                '%s %s.%s took %.1f ms; filter shape %s',
+                event.command_name, event.database_name, collection, seconds * 1000,
+                filter_shape(pending[1])
+            )
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_ms = 100
+        self._local = threading.local()
+        self.request_duration = Histogram(
+            'app_request_duration_seconds', 'Request latency until the body is sent.',
+            ('endpoint', 'method'))
+        self.requests = Counter('app_requests_total', 'Requests served.', ('endpoint', 'method', 'status'))
+        self.request_commands = Histogram(
+            'app_request_mongo_commands', 'MongoDB commands issued per request.',
+            ('endpoint',), COUNT_BUCKETS)
+        self.mongo_duration = Histogram(
+            'mongo_command_duration_seconds', 'MongoDB command round-trip time.',
+            ('command', 'collection'), COMMAND_BUCKETS)
+        self.mongo_failures = Counter('mongo_command_failures_total', 'Failed MongoDB commands.', ('command',))
+        self.export_rows = Counter('export_rows_total', 'Employees exported.', ('format', 'mode'))
+        self.export_bytes = Counter('export_bytes_total', 'Export bytes produced.', ('format', 'mode'))
+        self.export_duration = Histogram(
+            'export_duration_seconds', 'Time to produce an export.', ('format', 'mode'), EXPORT_BUCKETS)
+        self._collectors = []
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config['METRICS_ENABLED']
+        if not self.enabled:
+            return
+        self.slow_query_ms = config['MONGO_SLOW_QUERY_MS']
+        mongo.add_listener(CommandMetrics(self))
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self._metrics_view)
+        app.extensions['metrics'] = self
+
+    def collector(self, fn):
+        """Register fn() -> list of exposition lines, called on every scrape."""
+        self._collectors.append(fn)
+        return fn
+
+    # ── Requests ─────────────────────────────────────────────────
+
+    def count_command(self):
+        commands = getattr(self._local, 'commands', None)
+        if commands is not None:
+            self._local.commands = commands + 1
+
+    def _start_request(self):
+        self._local.started = time.perf_counter()
+        self._local.commands = 0
+
+    def _finish_request(self, response):
+        started = getattr(self._local, 'started', None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or '<unmatched>'
+        method = request.method
+        local = self._local
+
+        def record():
+            self.request_duration.observe(time.perf_counter() - started, endpoint, method)
+            self.requests.inc(endpoint, method, str(response.status_code))
+            self.request_commands.observe(local.commands or 0, endpoint)
+            local.started = None
+            local.commands = None
+
+        if response.is_streamed and not response.direct_passthrough:
+            # Generated bodies (the CSV export) do their work while being sent.
+            response.call_on_close(record)
+        else:
+            # Buffered bodies and send_file; passthrough files skip on-close callbacks.
+            record()
+        return response
+
+    # ── Exports ──────────────────────────────────────────────────
+
+    def observe_export(self, export_format, mode, rows, nbytes, seconds):
+        if not self.enabled:
+            return
+        self.export_rows.inc(export_format, mode, amount=rows)
+        self.export_bytes.inc(export_format, mode, amount=nbytes)
+        self.export_duration.observe(seconds, export_format, mode)
+
+    # ── Exposition ───────────────────────────────────────────────
+
+    def render(self):
+        lines = []
+        for metric in (self.request_duration, self.requests, self.request_commands,
+                       self.mongo_duration, self.mongo_failures,
+                       self.export_rows, self.export_bytes, self.export_duration):
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
+
+    def _metrics_view(self):
+        if not operator_allowed():
+            abort(403)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+def operator_allowed():
+    """
+    Whether the request may read operational detail: the bearer METRICS_TOKEN
+    when one is configured, or an admin session.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return session.get('role') == 'admin'
+
+
+metrics = Metrics()
+
+
+@metrics.collector
+def _pool_lines():
+    snapshot = mongo.pool_stats.snapshot()
+    return [
+        '# TYPE mongo_pool_connections gauge',
+        f"mongo_pool_connections{{state=\"open\"}} {snapshot['open']}",
+        f"mongo_pool_connections{{state=\"checked_out\"}} {snapshot['checked_out']}",
+        '# TYPE mongo_pool_checkout_failures_total counter',
+        f"mongo_pool_checkout_failures_total {snapshot['checkout_failures']}",
+    ]
+
+
+@metrics.collector
+def _cache_lines():
+    stats = employee_cache.stats.snapshot()
+    lines = ['# TYPE employee_cache_lookups_total counter']
+    for tier in ('request_hits', 'local_hits', 'shared_hits', 'misses'):
+        lines.append(f'employee_cache_lookups_total{{result="{tier}"}} {stats[tier]}')
+    lines += [
+        '# TYPE employee_cache_hit_ratio gauge',
+        f"employee_cache_hit_ratio {stats['hit_ratio'] or 0}",
+        '# TYPE employee_cache_evictions_total counter',
+        f"employee_cache_evictions_total {stats['evictions']}",
+    ]
+    return lines
@@ -1,11 +1,14 @@
 import os
-from pymongo import MongoClient
+import threading
+import click
 from werkzeug.security import generate_password_hash
+from extensions import employees_collection
+from indexes import init_indexes
+from search import backfill_missing as backfill_search_keys
+from stats import ensure_summary
 
-mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/employee_management")
-client = MongoClient(mongo_uri)
-db = client['employee_management']
-employees_collection = db['employees']
+_bootstrap_lock = threading.Lock()
+_bootstrapped = False
 
 def ensure_admin_exists():
     if not employees_collection.find_one({'role': 'admin'}):
@@ -18,4 +21,47 @@ def ensure_admin_exists():
             'details_completed': True
         })
 
-ensure_admin_exists()
\ No newline at end of file
+def bootstrap_database(app):
+    """
+    Database startup work: build indexes, seed the admin account, backfill
+    search keys for employees saved before they existed, and seed the roster
+    summary.
+    """
+    global _bootstrapped
+    with _bootstrap_lock:
+        if _bootstrapped:
+            return
+        init_indexes(app)
+        ensure_admin_exists()
+        backfilled = backfill_search_keys()
+        if backfilled is None:
+            app.logger.warning('Employees without search keys do not match roster searches; '
+                               'run `flask search reindex --missing-only`')
+        elif backfilled:
+            app.logger.info('Backfilled search keys for %d employee(s)', backfilled)
+        ensure_summary()
+        _bootstrapped = True
+
+def init_bootstrap(app):
+    """
+    Defer database startup work to the first request (or `flask bootstrap`),
+    so creating the app and importing modules never touch MongoDB.
+    """
+    @app.cli.command('bootstrap')
+    def bootstrap_command():
+        """Build indexes and seed the admin account."""
+        bootstrap_database(app)
+        click.echo('Database bootstrap complete.')
+
+    if not app.config['BOOTSTRAP_ON_FIRST_REQUEST']:
+        return
+
+    @app.before_request
+    def bootstrap_on_first_request():
+        if _bootstrapped:
+            return
+        try:
+            bootstrap_database(app)
+        except Exception:
+            # Retried on the next request; this one fails or succeeds on its own queries.
+            app.logger.exception('Database bootstrap failed')
@@ -0,0 +1,101 @@
+"""
+Parallel CSV export engine.
+
+The matching roster is split into contiguous `_id` ranges with $bucketAuto.
+Each range is flattened and written as finished CSV text in its own worker
+process with its own MongoClient, and the parent concatenates the parts in
+`_id` order. Bucket counts are known before any worker starts, so every
+shard is handed the Sr. No it starts at and the numbering stays contiguous.
+
+CSV only: a workbook cannot be concatenated, so Excel would have to ship
+every row back to the parent and be written there serially anyway. Excel
+jobs use the single-process write-only writer.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pymongo import MongoClient
+from exporters import EXPORT_PROJECTION, csv_row_chunks, iter_export_rows
+
+# More shards than workers keeps every process busy when shards are uneven.
+SHARDS_PER_WORKER = 4
+
+
+def plan_shards(collection, query, shards):
+    """
+    Split the matching documents into up to `shards` _id ranges.
+    Returns [(lower, upper, upper_inclusive, count, start_sr_no), ...] in _id order.
+    """
+    buckets = collection.aggregate([
+        {'$match': query},
+        {'$bucketAuto': {'groupBy': '$_id', 'buckets': max(shards, 1)}},
+    ], allowDiskUse=True)
+    plan = []
+    start = 1
+    buckets = list(buckets)
+    for index, bucket in enumerate(buckets):
+        # $bucketAuto upper bounds are exclusive except on the last bucket.
+        last = index == len(buckets) - 1
+        plan.append((bucket['_id']['min'], bucket['_id']['max'], last, bucket['count'], start))
+        start += bucket['count']
+    return plan
+
+
+def _shard_rows(settings, query, lower, upper, upper_inclusive, start, batch_size):
+    client = MongoClient(settings['uri'], **settings['options'])
+    try:
+        id_range = {'$gte': lower, '$lte' if upper_inclusive else '$lt': upper}
+        cursor = client[settings['db_name']]['employees'].find(
+            {'$and': [query, {'_id': id_range}]}, EXPORT_PROJECTION
+        ).sort('_id', 1).batch_size(batch_size)
+        yield from iter_export_rows(cursor, start=start)
+    finally:
+        client.close()
+
+
+def _format_shard(task):
+    """Worker: write one shard to `out_path`. Runs in a separate process."""
+    settings, query, shard, out_path, batch_size = task
+    lower, upper, upper_inclusive, count, start = shard
+    rows = _shard_rows(settings, query, lower, upper, upper_inclusive, start, batch_size)
+    with open(out_path, 'w', encoding='utf-8', newline='') as fileobj:
+        for chunk in csv_row_chunks(rows, header=False):
+            fileobj.write(chunk)
+    return count
+
+
+def run_parallel_export(settings, query, fileobj, workers, progress=None, batch_size=500):
+    """
+    Export the employees matching `query` as CSV to the binary file object
+    `fileobj` using `workers` processes. `settings` comes from Mongo.connection_settings().
+    `progress(count)` is called with the running employee total as shards finish.
+    """
+    client = MongoClient(settings['uri'], **settings['options'])
+    try:
+        plan = plan_shards(client[settings['db_name']]['employees'], query, workers * SHARDS_PER_WORKER)
+    finally:
+        client.close()
+
+    work_dir = tempfile.mkdtemp(prefix='export-shards-')
+    try:
+        paths = [os.path.join(work_dir, f'{index:05d}.part') for index in range(len(plan))]
+        tasks = [(settings, query, shard, path, batch_size) for shard, path in zip(plan, paths)]
+
+        # spawn: forked children would inherit the parent's MongoClient threads and sockets.
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            done = 0
+            for count in pool.map(_format_shard, tasks):
+                done += count
+                if progress:
+                    progress(done)
+
+        for chunk in csv_row_chunks([], header=True):
+            fileobj.write(chunk.encode('utf-8'))
+        for path in paths:
+            with open(path, 'rb') as part:
+                shutil.copyfileobj(part, fileobj)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,164 @@
+"""
+Columnar export for analytics and insurer feeds (export_type 'parquet').
+
+Two flat Parquet tables, zipped together:
+
+  employees.parquet   one row per employee
+  dependents.parquet  one row per exported dependent, joined on employee_id
+
+Columns are typed rather than formatted: dates are date32 (null when a stored
+value cannot be parsed), sums insured are int64, and gender, relationship and
+marital status are dictionary-encoded categoricals. Dependents follow the
+nested export's rule and only appear for the DEPENDENT_MARITAL_STATUSES.
+
+Rows are written as record batches while the cursor is read, so memory is
+bounded by the batch size. Needs pyarrow, which is optional
+(requirements-parquet.txt); PARQUET_AVAILABLE tells the UI whether to offer it.
+"""
+import importlib.util
+import os
+import shutil
+import tempfile
+import zipfile
+from extensions import employees_collection
+from exporters import DEPENDENT_MARITAL_STATUSES
+from dates import parse_date
+
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+PARQUET_PROJECTION = {
+    'employee_id': 1, 'name': 1, 'dob': 1, 'gender': 1, 'designation': 1, 'department': 1,
+    'phone': 1, 'email': 1, 'marital_status': 1, 'date_of_joining': 1, 'details_completed': 1,
+    'sum_insured_gmc': 1, 'sum_insured_gpa': 1, 'sum_insured_gtl': 1,
+    'family_members.name': 1, 'family_members.relationship': 1, 'family_members.gender': 1,
+    'family_members.date_of_birth': 1,
+}
+
+PARQUET_COMPRESSION = 'zstd'
+
+
+def _schemas():
+    import pyarrow as pa
+
+    category = pa.dictionary(pa.int32(), pa.string())
+    employees = pa.schema([
+        ('employee_id', pa.string()),
+        ('name', pa.string()),
+        ('dob', pa.date32()),
+        ('gender', category),
+        ('designation', pa.string()),
+        ('department', pa.string()),
+        ('phone', pa.string()),
+        ('email', pa.string()),
+        ('marital_status', category),
+        ('date_of_joining', pa.date32()),
+        ('sum_insured_gmc', pa.int64()),
+        ('sum_insured_gpa', pa.int64()),
+        ('sum_insured_gtl', pa.int64()),
+        ('details_completed', pa.bool_()),
+        ('dependent_count', pa.int16()),
+    ])
+    dependents = pa.schema([
+        ('employee_id', pa.string()),
+        ('name', pa.string()),
+        ('relationship', category),
+        ('gender', category),
+        ('date_of_birth', pa.date32()),
+    ])
+    return employees, dependents
+
+
+def _text(value):
+    value = '' if value is None else str(value).strip()
+    return value or None
+
+
+def _integer(value):
+    try:
+        number = float(str(value).replace(',', '').strip())
+    except ValueError:
+        return None
+    return int(number) if number.is_integer() else None
+
+
+class _BatchWriter:
+    """Column lists for one table, flushed to a ParquetWriter every `batch_size` rows."""
+
+    def __init__(self, path, schema, batch_size):
+        import pyarrow.parquet as pq
+        self.schema = schema
+        self.batch_size = batch_size
+        self.writer = pq.ParquetWriter(path, schema, compression=PARQUET_COMPRESSION)
+        self.columns = {name: [] for name in schema.names}
+        self.pending = 0
+        self.rows = 0
+
+    def add(self, values):
+        for name, value in zip(self.schema.names, values):
+            self.columns[name].append(value)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        import pyarrow as pa
+        if not self.pending:
+            return
+        arrays = [pa.array(self.columns[field.name], type=field.type) for field in self.schema]
+        self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows += self.pending
+        self.columns = {name: [] for name in self.schema.names}
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def write_parquet_tables(employees, directory, batch_size=10000):
+    """Write employees.parquet and dependents.parquet into directory. Returns the employee count."""
+    employee_schema, dependent_schema = _schemas()
+    emp_out = _BatchWriter(os.path.join(directory, 'employees.parquet'), employee_schema, batch_size)
+    dep_out = _BatchWriter(os.path.join(directory, 'dependents.parquet'), dependent_schema, batch_size)
+    try:
+        for emp in employees:
+            employee_id = _text(emp.get('employee_id'))
+            marital_status = (emp.get('marital_status') or '').strip().lower()
+            members = (emp.get('family_members') or []) if marital_status in DEPENDENT_MARITAL_STATUSES else []
+            for member in members:
+                dep_out.add((
+                    employee_id, _text(member.get('name')), _text(member.get('relationship')),
+                    _text(member.get('gender')), parse_date(member.get('date_of_birth')),
+                ))
+            emp_out.add((
+                employee_id, _text(emp.get('name')), parse_date(emp.get('dob')), _text(emp.get('gender')),
+                _text(emp.get('designation')), _text(emp.get('department')), _text(emp.get('phone')),
+                _text(emp.get('email')), marital_status or None, parse_date(emp.get('date_of_joining')),
+                _integer(emp.get('sum_insured_gmc', '')), _integer(emp.get('sum_insured_gpa', '')),
+                _integer(emp.get('sum_insured_gtl', '')), bool(emp.get('details_completed')), len(members),
+            ))
+    finally:
+        emp_out.close()
+        dep_out.close()
+        close = getattr(employees, 'close', None)
+        if close is not None:
+            close()
+    return emp_out.rows
+
+
+def write_parquet(query, fileobj, batch_size=10000):
+    """
+    Zip of both tables for the employees matching `query`, written to a
+    binary file object. Returns the employee count.
+    """
+    cursor = employees_collection.find(query, PARQUET_PROJECTION).batch_size(min(batch_size, 1000))
+    directory = tempfile.mkdtemp(prefix='parquet-export-')
+    try:
+        count = write_parquet_tables(cursor, directory, batch_size)
+        # Parquet pages are already compressed; store them as they are.
+        with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_STORED) as archive:
+            for name in ('employees.parquet', 'dependents.parquet'):
+                archive.write(os.path.join(directory, name), name)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return count
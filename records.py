@@ -0,0 +1,75 @@
+"""
+Compact employee records and the projection profiles that load them.
+
+Routes that only show or check a few fields read them through a named
+profile and get an `Employee`, a `__slots__` object holding just those
+values, instead of the stored document with its password hash, search keys
+and stored family buckets:
+
+  listing  the admin roster table
+  export   the CSV/XLSX/delta exports
+  auth     login and password checks
+
+The employee detail page builds its `Employee` from the cached full
+document (cache.py), which complete_profile shares, so it has no profile.
+
+Fields a profile does not load read as '' (False for details_completed,
+an empty tuple for family_members, None for _id and revision), the same as a
+missing key renders in a template.
+"""
+from extensions import employees_collection
+
+PROFILES = {
+    'listing': {
+        'employee_id': 1, 'name': 1, 'designation': 1, 'department': 1, 'phone': 1, 'email': 1,
+        'revision': 1
+    },
+    'export': {
+        'employee_id': 1, 'name': 1, 'dob': 1, 'age': 1, 'gender': 1, 'designation': 1,
+        'phone': 1, 'date_of_joining': 1, 'sum_insured_gmc': 1, 'sum_insured_gpa': 1,
+        'sum_insured_gtl': 1, 'email': 1, 'marital_status': 1, 'family_members': 1,
+        'family_schema_version': 1
+    },
+    'auth': {
+        'employee_id': 1, 'phone': 1, 'password': 1, 'role': 1, 'details_completed': 1
+    },
+}
+
+
+class FamilyMember:
+    __slots__ = ('name', 'relationship', 'gender', 'date_of_birth', 'age', 'phone')
+
+    @classmethod
+    def from_doc(cls, doc):
+        member = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(member, name, doc.get(name) or '')
+        return member
+
+
+class Employee:
+    __slots__ = ('_id', 'employee_id', 'name', 'phone', 'email', 'designation', 'department', 'gender',
+                 'dob', 'age', 'date_of_joining', 'marital_status', 'sum_insured_gmc', 'sum_insured_gpa',
+                 'sum_insured_gtl', 'role', 'password', 'details_completed', 'revision', 'family_members')
+
+    _DEFAULTS = {'_id': None, 'details_completed': False, 'revision': None}
+
+    @classmethod
+    def from_doc(cls, doc):
+        """Record from a (projected) employee document."""
+        record = cls.__new__(cls)
+        defaults = cls._DEFAULTS
+        for name in cls.__slots__[:-1]:
+            value = doc.get(name)
+            setattr(record, name, defaults.get(name, '') if value is None else value)
+        record.family_members = tuple(FamilyMember.from_doc(m) for m in doc.get('family_members') or ())
+        return record
+
+    def __repr__(self):
+        return f'<Employee {self.employee_id or self._id}>'
+
+
+def find_employee(query, profile):
+    """The first employee matching `query`, loaded with `profile`, or None."""
+    doc = employees_collection.find_one(query, PROFILES[profile])
+    return None if doc is None else Employee.from_doc(doc)
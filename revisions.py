@@ -0,0 +1,178 @@
+"""
+Change tracking for the delta export.
+
+Every employee write stamps `revision` and `updated_at`. Revisions come from
+the roster version counter (stats.next_revision), so they only ever increase.
+A delete leaves a tombstone in `employee_tombstones` with the revision of the
+delete. Both collections are indexed on `revision`, so "what changed since
+revision N" reads only the churn, never the whole roster.
+
+A revision is drawn before its write lands, so a slow write can commit after
+a later one. The feed therefore stops at a watermark: the highest revision
+that is at least DELTA_SETTLE_SECONDS old. Consumers pass that watermark back
+as `since` next time. Writes that take longer than the settle time to commit
+can still be missed.
+"""
+import csv
+import heapq
+import io
+from datetime import datetime, timedelta, timezone
+import click
+from flask.cli import AppGroup
+from pymongo import UpdateOne
+from extensions import employees_collection, employee_tombstones_collection
+from exporters import EXPORT_HEADERS, EXPORT_PROJECTION, iter_export_rows
+from stats import next_revision
+
+DELTA_HEADERS = ['Change', 'Revision', 'Updated At'] + EXPORT_HEADERS
+
+DELTA_PROJECTION = dict(EXPORT_PROJECTION, revision=1, updated_at=1)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def stamp(fields, revision=None):
+    """Add revision/updated_at to a document or $set dict, in place; returns it."""
+    fields['revision'] = next_revision() if revision is None else revision
+    fields['updated_at'] = _now()
+    return fields
+
+
+def stamp_many(docs):
+    """Stamp several documents with one counter round-trip."""
+    if not docs:
+        return docs
+    last = next_revision(len(docs))
+    for revision, doc in enumerate(docs, last - len(docs) + 1):
+        stamp(doc, revision)
+    return docs
+
+
+def record_tombstones(employees):
+    """Leave a tombstone for each deleted employee (needs _id and employee_id)."""
+    employees = [emp for emp in employees if emp]
+    if not employees:
+        return
+    last = next_revision(len(employees))
+    deleted_at = _now()
+    employee_tombstones_collection.insert_many([
+        {'employee_ref': emp['_id'], 'employee_id': emp.get('employee_id'),
+         'revision': revision, 'deleted_at': deleted_at}
+        for revision, emp in enumerate(employees, last - len(employees) + 1)
+    ])
+
+
+# ── Delta feed ───────────────────────────────────────────────────
+
+def _live_filter(since, until=None):
+    revision = {'$gt': since}
+    if until is not None:
+        revision['$lte'] = until
+    return {'revision': revision, 'role': {'$ne': 'admin'}}
+
+
+def delta_watermark(since, settle_seconds=5):
+    """Highest settled revision above `since` across employees and tombstones, else `since`."""
+    cutoff = _now() - timedelta(seconds=settle_seconds)
+    watermark = since
+    for collection, query, time_field in (
+        (employees_collection, _live_filter(since), 'updated_at'),
+        (employee_tombstones_collection, {'revision': {'$gt': since}}, 'deleted_at'),
+    ):
+        latest = collection.find(dict(query, **{time_field: {'$lte': cutoff}}), {'revision': 1}) \
+            .sort('revision', -1).limit(1)
+        for doc in latest:
+            watermark = max(watermark, doc['revision'])
+    return watermark
+
+
+def iter_changes(since, watermark, batch_size=500):
+    """
+    ('upsert', employee) and ('delete', tombstone) pairs with since < revision
+    <= watermark, in revision order, so replaying them in order is correct
+    even for an employee code that was deleted and then created again.
+    """
+    if watermark <= since:
+        return
+    live = employees_collection.find(_live_filter(since, watermark), DELTA_PROJECTION) \
+        .sort('revision', 1).batch_size(batch_size)
+    dead = employee_tombstones_collection.find({'revision': {'$gt': since, '$lte': watermark}}) \
+        .sort('revision', 1).batch_size(batch_size)
+    try:
+        yield from heapq.merge(
+            (('upsert', emp) for emp in live),
+            (('delete', tomb) for tomb in dead),
+            key=lambda change: change[1]['revision']
+        )
+    finally:
+        live.close()
+        dead.close()
+
+
+def _timestamp(value):
+    if not isinstance(value, datetime):
+        return ''
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def delta_csv_chunks(changes, chunk_rows=200):
+    """
+    The delta feed as CSV: the export columns prefixed by the change type,
+    revision and time. Changed employees keep their dependent rows under
+    them; deletes carry only the employee code. No blank spacer rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(DELTA_HEADERS)
+    rows = 0
+    sr_no = 1
+    for change, doc in changes:
+        if change == 'delete':
+            writer.writerow(['delete', doc['revision'], _timestamp(doc.get('deleted_at')), '',
+                             doc.get('employee_id') or ''] + [''] * (len(EXPORT_HEADERS) - 2))
+            rows += 1
+        else:
+            meta = ['upsert', doc['revision'], _timestamp(doc.get('updated_at'))]
+            for kind, _, row in iter_export_rows([doc], start=sr_no):
+                if kind == 'employee':
+                    writer.writerow(meta + row)
+                elif kind == 'dependent':
+                    writer.writerow(['', '', ''] + row)
+                rows += kind != 'blank'
+            sr_no += 1
+        if rows >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            rows = 0
+    yield buffer.getvalue()
+
+
+# ── Maintenance ──────────────────────────────────────────────────
+
+def backfill(batch_size=500):
+    """Stamp employees saved before revisions existed. Returns the number stamped."""
+    stamped = 0
+    while True:
+        ids = [doc['_id'] for doc in employees_collection.find(
+            {'revision': {'$exists': False}}, {'_id': 1}).limit(batch_size)]
+        if not ids:
+            return stamped
+        fields = stamp_many([{} for _ in ids])
+        employees_collection.bulk_write([
+            UpdateOne({'_id': _id, 'revision': {'$exists': False}}, {'$set': stamp_fields})
+            for _id, stamp_fields in zip(ids, fields)
+        ], ordered=False)
+        stamped += len(ids)
+
+
+revisions_cli = AppGroup('revisions', help='Change tracking for the delta export.')
+
+
+@revisions_cli.command('backfill')
+@click.option('--batch-size', default=500, show_default=True)
+def backfill_command(batch_size):
+    """Give employees saved before change tracking a revision, so the next feed includes them."""
+    click.echo(f'Stamped {backfill(batch_size)} employee(s).')
@@ -1,13 +1,102 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from models import employees_collection
+import asyncio
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
+from extensions import employees_collection
 from forms import CSRFOnlyForm
-from bson import ObjectId
+from bson import ObjectId, errors as bson_errors
 from werkzeug.security import generate_password_hash, check_password_hash
-from utils import normalize_family
-import re
+from search import build_search_query
+from importer import import_employees
+from cache import employee_cache
+from parquet_export import PARQUET_AVAILABLE
+from records import PROFILES, Employee, find_employee
+from revisions import record_tombstones, stamp
+from stats import STATS_PROJECTION, SUMMARY_ID, record_deleted, summary as roster_summary, summary_view
 
 admin_bp = Blueprint('admin', __name__)
 
+# Columns rendered by the roster table in admin_dashboard.html.
+LISTING_PROJECTION = PROFILES['listing']
+
+def _parse_object_id(value):
+    if not value:
+        return None
+    try:
+        return ObjectId(value)
+    except (bson_errors.InvalidId, TypeError):
+        return None
+
+def _page_size():
+    default = current_app.config['ADMIN_PAGE_SIZE']
+    try:
+        per_page = int(request.args.get('per_page', default))
+    except ValueError:
+        per_page = default
+    return max(1, min(per_page, current_app.config['ADMIN_MAX_PAGE_SIZE']))
+
+def _keyset_find(query, after=None, before=None):
+    """
+    Filter and _id sort direction for one page of the roster.
+
+    Pages are addressed by the _id bounds of the neighbouring page instead of
+    an offset, so every page costs the same index range scan however deep
+    into the collection it is. One extra document is read to tell whether
+    another page exists in the direction of travel.
+    """
+    if before is not None:
+        return dict(query, _id={'$lt': before}), -1
+    if after is not None:
+        return dict(query, _id={'$gt': after}), 1
+    return query, 1
+
+def _keyset_result(employees, per_page, after=None, before=None):
+    """(employees, has_prev, has_next) from the per_page + 1 documents read."""
+    if before is not None:
+        return employees[:per_page][::-1], len(employees) > per_page, True
+    return employees[:per_page], after is not None, len(employees) > per_page
+
+def _keyset_page(query, per_page, after=None, before=None):
+    """Fetch one page of the roster ordered by _id."""
+    page_query, direction = _keyset_find(query, after, before)
+    cursor = employees_collection.find(page_query, LISTING_PROJECTION).sort('_id', direction).limit(per_page + 1)
+    return _keyset_result([Employee.from_doc(doc) for doc in cursor], per_page, after, before)
+
+def _roster_count(query, search):
+    """
+    Cheap count for the pager: collection metadata when unfiltered, a capped
+    count for searches. Returns (count, is_capped) or None when disabled.
+    """
+    if not current_app.config['ADMIN_COUNT_ESTIMATE']:
+        return None
+    if not search:
+        # Metadata count includes the admin account.
+        return max(employees_collection.estimated_document_count() - 1, 0), False
+    limit = current_app.config['ADMIN_COUNT_LIMIT']
+    count = employees_collection.count_documents(query, limit=limit)
+    return count, count >= limit
+
+async def _roster_count_async(collection, query, search):
+    if not current_app.config['ADMIN_COUNT_ESTIMATE']:
+        return None
+    if not search:
+        return max(await collection.estimated_document_count() - 1, 0), False
+    limit = current_app.config['ADMIN_COUNT_LIMIT']
+    count = await collection.count_documents(query, limit=limit)
+    return count, count >= limit
+
+def _roster_query(search):
+    query = {'role': {'$ne': 'admin'}}
+    if search:
+        query.update(build_search_query(search))
+    return query
+
+def _pager(employees, per_page, has_prev, has_next, count):
+    return {
+        'per_page': per_page,
+        'prev_before': str(employees[0]._id) if has_prev and employees else None,
+        'next_after': str(employees[-1]._id) if has_next and employees else None,
+        'count': count
+    }
+
 @admin_bp.route('/admin', methods=['GET', 'POST'])
 def admin_dashboard():
     if session.get('role') != 'admin':
@@ -18,33 +107,85 @@ def admin_dashboard():
     if request.method == 'POST':
         if form.validate_on_submit():
             search_term = request.form.get('search', '').strip()
-            return redirect(url_for('admin.admin_dashboard', search=search_term))
+            return redirect(url_for('admin.admin_dashboard', search=search_term,
+                                    per_page=request.args.get('per_page')))
         else:
             flash('Invalid or missing CSRF token.', 'danger')
             return redirect(url_for('admin.admin_dashboard'))
 
     search = request.args.get('search', '').strip()
-    query = {'role': {'$ne': 'admin'}}
-    if search:
-        exact_fields = ['employee_id', 'phone', 'gender', 'designation', 'department']
-        partial_fields = ['name', 'email']
-        conditions = []
-        # Exact match (case-insensitive)
-        for field in exact_fields:
-            conditions.append({
-                field: {'$regex': f'^{re.escape(search)}$', '$options': 'i'}
-            })
-
-        # Partial match (case-insensitive)
-        for field in partial_fields:
-            conditions.append({
-                field: {'$regex': f'{re.escape(search)}', '$options': 'i'}
-            })
-
-        query['$or'] = conditions
-
-    employees = list(employees_collection.find(query))
-    return render_template('admin_dashboard.html', employees=employees, form=form)
+    query = _roster_query(search)
+
+    per_page = _page_size()
+    after = _parse_object_id(request.args.get('after'))
+    before = _parse_object_id(request.args.get('before'))
+    employees, has_prev, has_next = _keyset_page(query, per_page, after=after, before=before)
+
+    pager = _pager(employees, per_page, has_prev, has_next, _roster_count(query, search))
+    return render_template('admin_dashboard.html', employees=employees, form=form, pager=pager,
+                           stats=roster_summary(), parquet_available=PARQUET_AVAILABLE)
+
+async def admin_dashboard_async(db):
+    """
+    GET admin_dashboard on the async read path (asgi.py); `db` is an async
+    database. The page, the count and the summary are read concurrently.
+    Search submissions are POSTs and stay with the threaded view.
+    """
+    if session.get('role') != 'admin':
+        flash('Unauthorized access.', 'danger')
+        return redirect(url_for('auth.dashboard'))
+
+    form = CSRFOnlyForm()
+    search = request.args.get('search', '').strip()
+    query = _roster_query(search)
+
+    per_page = _page_size()
+    after = _parse_object_id(request.args.get('after'))
+    before = _parse_object_id(request.args.get('before'))
+    page_query, direction = _keyset_find(query, after, before)
+    collection = db['employees']
+    docs, count, stats_doc = await asyncio.gather(
+        collection.find(page_query, LISTING_PROJECTION).sort('_id', direction).limit(per_page + 1).to_list(),
+        _roster_count_async(collection, query, search),
+        db['roster_stats'].find_one({'_id': SUMMARY_ID}),
+    )
+    employees, has_prev, has_next = _keyset_result([Employee.from_doc(doc) for doc in docs], per_page, after, before)
+
+    pager = _pager(employees, per_page, has_prev, has_next, count)
+    return render_template('admin_dashboard.html', employees=employees, form=form, pager=pager,
+                           stats=summary_view(stats_doc), parquet_available=PARQUET_AVAILABLE)
+
+@admin_bp.route('/admin/import', methods=['GET', 'POST'])
+def import_roster():
+    if session.get('role') != 'admin':
+        flash('Unauthorized access.', 'danger')
+        return redirect(url_for('auth.dashboard'))
+
+    form = CSRFOnlyForm()
+    report = None
+    if request.method == 'POST':
+        # Before anything reads the form, which would spool the whole body.
+        max_mb = current_app.config['IMPORT_MAX_UPLOAD_MB']
+        if request.content_length and request.content_length > max_mb * 1024 * 1024:
+            flash(f'Import files are limited to {max_mb} MB.', 'danger')
+            return redirect(url_for('admin.import_roster'))
+        if not form.validate_on_submit():
+            flash('Invalid or missing CSRF token.', 'danger')
+            return redirect(url_for('admin.import_roster'))
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Choose a CSV or Excel file to import.', 'warning')
+            return redirect(url_for('admin.import_roster'))
+        try:
+            report = import_employees(upload.stream, upload.filename,
+                                      batch_size=current_app.config['IMPORT_BATCH_SIZE'])
+        except ValueError as exc:
+            flash(str(exc), 'danger')
+            return redirect(url_for('admin.import_roster'))
+        flash(f'{report.inserted} employee(s) added, {report.updated} updated, '
+              f'{len(report.errors)} rejected.', 'success' if not report.errors else 'warning')
+
+    return render_template('admin_import.html', form=form, report=report)
 
 @admin_bp.route('/employee/delete/<employee_id>', methods=['POST'])
 def delete_employee(employee_id):
@@ -56,8 +197,13 @@ def delete_employee(employee_id):
         flash('Cannot delete the admin account.', 'danger')
         return redirect(url_for('admin.admin_dashboard'))
 
-    result = employees_collection.delete_one({'employee_id': employee_id, 'role': {'$ne': 'admin'}})
-    if result.deleted_count:
+    deleted = employees_collection.find_one_and_delete(
+        {'employee_id': employee_id, 'role': {'$ne': 'admin'}}, projection=dict(STATS_PROJECTION, employee_id=1)
+    )
+    if deleted:
+        employee_cache.invalidate(deleted['_id'], employee_id)
+        record_tombstones([deleted])
+        record_deleted([deleted])
         flash(f"Employee {employee_id} deleted.", "success")
     else:
         flash("Employee not found or cannot be deleted.", "danger")
@@ -80,10 +226,15 @@ def delete_selected():
         flash("No valid employees selected.", "warning")
         return redirect(url_for('admin.admin_dashboard'))
 
-    result = employees_collection.delete_many({
-        'employee_id': {'$in': filtered_ids},
-        'role': {'$ne': 'admin'}
-    })
+    # Read what is about to go so the roster summary can subtract it.
+    doomed = list(employees_collection.find(
+        {'employee_id': {'$in': filtered_ids}, 'role': {'$ne': 'admin'}}, dict(STATS_PROJECTION, employee_id=1)
+    ))
+    result = employees_collection.delete_many({'_id': {'$in': [emp['_id'] for emp in doomed]}})
+    employee_cache.invalidate([emp['_id'] for emp in doomed], filtered_ids)
+    record_tombstones(doomed)
+    # If something else deleted some of them first, leave the totals to the next reconcile.
+    record_deleted(doomed if result.deleted_count == len(doomed) else [])
     flash(f"{result.deleted_count} employee(s) deleted.", "success")
     return redirect(url_for('admin.admin_dashboard'))
 
@@ -102,11 +253,13 @@ def admin_change_password():
             flash("New password and confirmation do not match.", "danger")
             return redirect(url_for('admin.admin_change_password'))
 
-        admin = employees_collection.find_one({'role': 'admin'})
-        if not admin or not check_password_hash(admin['password'], current_password):
+        admin = find_employee({'role': 'admin'}, 'auth')
+        if not admin or not check_password_hash(admin.password, current_password):
             flash("Current password is incorrect.", "danger")
         else:
-            employees_collection.update_one({'_id': admin['_id']}, {'$set': {'password': generate_password_hash(new_password)}})
+            employees_collection.update_one({'_id': admin._id},
+                                            {'$set': stamp({'password': generate_password_hash(new_password)})})
+            employee_cache.invalidate(admin._id)
             flash("Password updated successfully.", "success")
             return redirect(url_for('admin.admin_dashboard'))
 
@@ -118,7 +271,7 @@ def change_employee_password(employee_id):
         flash('Unauthorized access.', 'danger')
         return redirect(url_for('auth.dashboard'))
 
-    employee = employees_collection.find_one({'employee_id': employee_id})
+    employee = employee_cache.by_employee_id(employee_id)
     if not employee:
         flash("Employee not found.", "danger")
         return redirect(url_for('admin.admin_dashboard'))
@@ -133,9 +286,10 @@ def change_employee_password(employee_id):
 
         employees_collection.update_one(
             {'employee_id': employee_id},
-            {'$set': {'password': generate_password_hash(new_password)}}
+            {'$set': stamp({'password': generate_password_hash(new_password)})}
         )
+        employee_cache.invalidate(employee['_id'], employee_id)
         flash(f"Password for {employee.get('name', 'Employee')} updated successfully.", "success")
-        return redirect(url_for('admin.employee_detail', employee_id=employee_id))
+        return redirect(url_for('main.employee_detail', employee_id=employee_id))
 
     return render_template('admin_change_password.html', employee_id=employee_id, is_admin=False)
\ No newline at end of file
@@ -1,30 +1,17 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from pymongo.errors import DuplicateKeyError
 from werkzeug.security import generate_password_hash, check_password_hash
-from bson.objectid import ObjectId  
-from models import employees_collection
+from extensions import employees_collection
 from forms import CSRFOnlyForm
+from search import search_keys
+from utils import _get_employee_by_session_id
+from stats import record_change
+from records import find_employee
+from cache import employee_cache
+from revisions import stamp
 
 auth_bp = Blueprint('auth', __name__)
 
-# ── Helper to fetch an employee safely ───────────────────────────
-def _get_employee_by_session_id(emp_id):
-    """
-    Return the employee document or None.
-
-    Handles:
-      - Missing / empty IDs
-      - Badly‑formed ObjectIds
-      - Numeric employee_id fallback
-    """
-    if not emp_id:
-        return None
-
-    try:
-        return employees_collection.find_one({'_id': ObjectId(emp_id)})
-    except Exception:
-        return employees_collection.find_one({'employee_id': emp_id})
-
-
 @auth_bp.route('/')
 def landing():
     return render_template('landing.html')
@@ -74,23 +61,55 @@ def register():
         flash('All fields are required.', 'danger')
         return render_template('dashboard.html', form=form)
 
-    if employees_collection.find_one({'phone': phone}):
+    hashed_pw = generate_password_hash(password)
+    existing = employees_collection.find_one({'phone': phone}, {'_id': 1, 'password': 1, 'details_completed': 1})
+    if existing and not existing.get('password'):
+        return _claim_imported(existing, hashed_pw, form)
+    if existing:
         flash('An account with this phone already exists.', 'danger')
         return render_template('dashboard.html', form=form)
 
-    hashed_pw = generate_password_hash(password)
-    result = employees_collection.insert_one({
+    new_employee = {
         'name': name,
         'phone': phone,
         'password': hashed_pw,
         'details_completed': False
-    })
+    }
+    new_employee['search_keys'] = search_keys(new_employee)
+    try:
+        result = employees_collection.insert_one(stamp(new_employee))
+    except DuplicateKeyError:
+        # Registered by a concurrent request after the check above.
+        flash('An account with this phone already exists.', 'danger')
+        return render_template('dashboard.html', form=form)
+    record_change(None, new_employee)
 
     session['mongo_id'] = str(result.inserted_id)
     session['role'] = 'user'
     flash('Registration successful.', 'success')
     return redirect(url_for('main.complete_profile'))
 
+def _claim_imported(employee, hashed_pw, form):
+    """
+    Registration for an employee the roster import created: it has a profile
+    but no password, so registering with its phone sets one and logs in.
+    """
+    claimed = employees_collection.update_one(
+        {'_id': employee['_id'], 'password': {'$in': [None, '']}}, {'$set': stamp({'password': hashed_pw})}
+    )
+    if not claimed.modified_count:
+        # Claimed by a concurrent request.
+        flash('An account with this phone already exists.', 'danger')
+        return render_template('dashboard.html', form=form)
+    employee_cache.invalidate(employee['_id'])
+
+    session['mongo_id'] = str(employee['_id'])
+    session['role'] = 'user'
+    flash('Registration successful.', 'success')
+    if employee.get('details_completed'):
+        return redirect(url_for('main.employee_detail'))
+    return redirect(url_for('main.complete_profile'))
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     form = CSRFOnlyForm()
@@ -103,8 +122,8 @@ def login():
     role = request.form.get('role')
 
     if role == 'admin':
-        admin = employees_collection.find_one({'role': 'admin'})
-        if admin and check_password_hash(admin['password'], password):
+        admin = find_employee({'role': 'admin'}, 'auth')
+        if admin and check_password_hash(admin.password, password):
             session['role'] = 'admin'
             flash('Admin login successful.', 'success')
             #return redirect(url_for('auth.dashboard'))
@@ -119,16 +138,16 @@ def login():
             flash('Mobile number must be exactly 10 digits.', 'danger')
             return redirect(url_for('auth.dashboard', show_login=1))
 
-        employee = employees_collection.find_one({'phone': identifier})
-        if employee and check_password_hash(employee.get('password', ''), password):
+        employee = find_employee({'phone': identifier}, 'auth')
+        if employee and check_password_hash(employee.password, password):
             session['role'] = 'user'
-            session['mongo_id'] = str(employee['_id'])
-            session['employee_id'] = employee.get('employee_id', '')
-            session['user_phone'] = employee['phone']
+            session['mongo_id'] = str(employee._id)
+            session['employee_id'] = employee.employee_id
+            session['user_phone'] = employee.phone
             # Preserve the 'details_completed' flag from the database
             #session['details_completed'] = employee.get('details_completed', False)
             
-            if not employee.get('details_completed'):
+            if not employee.details_completed:
                 return redirect(url_for('main.complete_profile'))
             flash('Login successful.', 'success')
             return redirect(url_for('main.employee_detail'))
@@ -1,27 +1,28 @@
-from flask import Blueprint, request, redirect, url_for, flash, session, make_response, send_file
-from models import employees_collection
-from utils import normalize_family
-import csv
+from flask import Blueprint, request, redirect, url_for, flash, session, send_file, Response, stream_with_context, current_app, jsonify, abort
+from extensions import employees_collection
+from exporters import (
+    EXPORT_PROJECTION, EXCEL_MIMETYPE, build_export_query, csv_row_chunks, iter_export_rows, track_progress,
+    write_excel_styled_rows, write_excel_rows
+)
+from export_pipeline import iter_pipeline_rows
+from parquet_export import PARQUET_AVAILABLE, write_parquet
+from revisions import delta_csv_chunks, delta_watermark, iter_changes
+from export_jobs import EXPORT_FORMATS, export_fingerprint, export_queue
+from export_cache import export_cache
+from metrics import metrics
+from stats import roster_version
 import io
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.styles.borders import Border, Side
-from openpyxl.utils import get_column_letter
-import re
+import os
+import tempfile
+import time
 
 export_bp = Blueprint('export', __name__)
 
-def format_date_ddmmyyyy(date_str):
-    from datetime import datetime
-    if not date_str:
-        return ''
-    for fmt in ('%Y-%m-%d', '%d-%m-%Y', '%Y/%m/%d', '%d/%m/%Y', '%Y.%m.%d', '%d.%m.%Y'):
-        try:
-            d = datetime.strptime(date_str, fmt)
-            return d.strftime('%d-%m-%Y')
-        except Exception:
-            continue
-    return date_str
+def _export_params():
+    export_type = request.form.get('export_type')
+    search = request.form.get('search', '').strip()
+    selected_ids = request.form.get('selected_ids', '').split(',')
+    return export_type, search, selected_ids
 
 @export_bp.route('/export_handler', methods=['POST'])
 def export_handler():
@@ -29,165 +30,216 @@ def export_handler():
         flash('Unauthorized access.', 'danger')
         return redirect(url_for('auth.dashboard'))
 
-    export_type = request.form.get('export_type')
-    search = request.form.get('search', '').strip()
-    selected_ids = request.form.get('selected_ids', '').split(',')
-
-    query = {'role': {'$ne': 'admin'}}
+    export_type, search, selected_ids = _export_params()
+    if export_type == 'delta':
+        return generate_delta(request.form.get('since', '').strip())
+    if export_type not in EXPORT_FORMATS:
+        flash("Invalid export type", "danger")
+        return redirect(url_for('admin.admin_dashboard'))
 
-    if selected_ids and selected_ids != ['']:
-        query['employee_id'] = {'$in': selected_ids}
-    elif search:
-        exact_fields = ['employee_id', 'phone', 'gender']
-        partial_fields = ['name', 'designation', 'email']
-        pattern = f'\b{re.escape(search)}\b'
-        query['$or'] = [
-            {field: {'$regex': pattern, '$options': 'i'}} for field in exact_fields
-        ] + [
-            {field: {'$regex': re.escape(search), '$options': 'i'}} for field in partial_fields
-        ]
+    if export_type == 'parquet' and not PARQUET_AVAILABLE:
+        flash("Parquet export needs pyarrow installed on the server.", "danger")
+        return redirect(url_for('admin.admin_dashboard'))
 
-    employees = list(employees_collection.find(query))
+    cache_key = None
+    if export_cache.enabled:
+        # Read the version before generating: a write meanwhile moves on to a new key.
+        cache_key = export_cache.key(export_fingerprint(export_type, search, selected_ids), roster_version())
+        if export_cache.get(cache_key, export_type):
+            return redirect(url_for('export.download_cached_export', key=cache_key, export_type=export_type),
+                            code=303)
 
+    query = build_export_query(search, selected_ids)
     if export_type == 'csv':
-        return generate_csv(employees)
-    elif export_type == 'excel':
-        return generate_excel(employees)
-    else:
-        flash("Invalid export type", "danger")
+        return generate_csv(*_export_rows(query), cache_key=cache_key)
+    if export_type == 'parquet':
+        return generate_parquet(query, cache_key=cache_key)
+    # Only whether the threshold is reached matters, so stop counting there.
+    threshold = current_app.config['EXCEL_STREAMING_THRESHOLD']
+    if employees_collection.count_documents(query, limit=threshold) >= threshold:
+        return generate_excel_streaming(*_export_rows(query), cache_key=cache_key)
+    return generate_excel(*_export_rows(query), cache_key=cache_key)
+
+@export_bp.route('/exports/cached/<key>/<export_type>')
+def download_cached_export(key, export_type):
+    """A cached export; the key doubles as its ETag, so re-downloads can be answered with 304."""
+    if session.get('role') != 'admin':
+        flash('Unauthorized access.', 'danger')
+        return redirect(url_for('auth.dashboard'))
+
+    started = time.perf_counter()
+    path = export_cache.get(key, export_type) if export_type in EXPORT_FORMATS else None
+    if path is None:
+        flash('That export has expired; please export again.', 'warning')
         return redirect(url_for('admin.admin_dashboard'))
+    filename, mimetype = EXPORT_FORMATS[export_type]
+    response = send_file(path, as_attachment=True, download_name=filename, mimetype=mimetype,
+                         conditional=True, etag=key, max_age=0)
+    response.cache_control.private = True
+    metrics.observe_export(export_type, 'cache', 0, os.path.getsize(path), time.perf_counter() - started)
+    return response
 
-def generate_csv(employees):
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow([
-        'Sr. No', 'Employee Code', 'Name of Employee/Dependent', 'DOB', 'Age', 'Relation', 'Gender',
-        'Designation', 'Contact No.', 'Date of Joining',
-        'Sum Insured - GMC', 'Sum Insured - GPA', 'Sum Insured - GTL', 'Email ID', 'Marital Status'
-    ])
-
-    sr_no = 1
-    for emp in employees:
-        emp = normalize_family(emp)
-        writer.writerow([
-            sr_no,
-            emp.get('employee_id', ''),
-            emp.get('name', ''),
-            format_date_ddmmyyyy(emp.get('dob', '')),
-            emp.get('age', ''),
-            'Employee',
-            emp.get('gender', ''),
-            emp.get('designation', ''),
-            emp.get('phone', ''),
-            format_date_ddmmyyyy(emp.get('date_of_joining', '')),
-            emp.get('sum_insured_gmc', ''),
-            emp.get('sum_insured_gpa', ''),
-            emp.get('sum_insured_gtl', ''),
-            emp.get('email', ''),
-            emp.get('marital_status', '')
-        ])
-        if emp.get('marital_status', '').lower() in ['married', 'widowed', 'divorced']:
-            for member in emp.get('family_members', []):
-                writer.writerow([
-                    '', '', member.get('name', ''),
-                    format_date_ddmmyyyy(member.get('date_of_birth', '')),
-                    member.get('age', ''),
-                    member.get('relationship', ''),
-                    member.get('gender', ''), '', '', '', '', '', '', '', ''
-                ])
-        writer.writerow([''] * 15)
-        writer.writerow([''] * 15)
-        sr_no += 1
-
-    response = make_response(output.getvalue())
+def _export_rows(query):
+    """
+    Export rows from the configured EXPORT_ENGINE, plus the progress record
+    metrics read (employees are only counted when metrics are on).
+    """
+    progress = {'rows': 0, 'started': time.perf_counter()}
+    track = (lambda count: progress.update(rows=count)) if metrics.enabled else None
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    if current_app.config['EXPORT_ENGINE'] == 'pipeline':
+        return iter_pipeline_rows(query, batch_size, progress=track), progress
+
+    employees = employees_collection.find(query, EXPORT_PROJECTION).batch_size(batch_size)
+    if track:
+        employees = track_progress(employees, track)
+    return iter_export_rows(employees), progress
+
+def _observe(export_format, mode, progress, nbytes):
+    metrics.observe_export(export_format, mode, progress['rows'], nbytes,
+                           time.perf_counter() - progress['started'])
+
+def _observed_chunks(chunks, progress):
+    nbytes = 0
+    for chunk in chunks:
+        nbytes += len(chunk)
+        yield chunk
+    _observe('csv', 'stream', progress, nbytes)
+
+def generate_csv(rows, progress, cache_key=None):
+    """
+    Stream the nested CSV as it is produced, flushing every
+    EXPORT_CSV_CHUNK_ROWS rows, so the header reaches the client straight away.
+    With a cache key the chunks are also written to the export cache.
+    """
+    chunks = (chunk.encode('utf-8')
+              for chunk in csv_row_chunks(rows, current_app.config['EXPORT_CSV_CHUNK_ROWS']))
+    if metrics.enabled:
+        chunks = _observed_chunks(chunks, progress)
+    if cache_key:
+        chunks = export_cache.tee(chunks, cache_key, 'csv')
+    response = Response(stream_with_context(chunks), mimetype='text/csv')
     response.headers['Content-Disposition'] = 'attachment; filename=employees_nested.csv'
-    response.headers['Content-type'] = 'text/csv'
+    if cache_key:
+        response.set_etag(cache_key)
     return response
 
-def generate_excel(employees):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Employee Data"
-
-    headers = [
-        'Sr. No', 'Employee Code', 'Name of Employee/Dependent', 'DOB', 'Age', 'Relation', 'Gender',
-        'Designation', 'Contact No.', 'Date of Joining',
-        'Sum Insured - GMC', 'Sum Insured - GPA', 'Sum Insured - GTL', 'Email ID', 'Marital Status'
-    ]
-
-    header_fill = PatternFill(start_color='042351', end_color='042351', fill_type='solid')
-    header_font = Font(color='FFFFFF', bold=True)
-    align_center = Alignment(horizontal='center', vertical='center')
-
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = align_center
-        ws.column_dimensions[get_column_letter(col_num)].width = 20
-
-    sr_no = 1
-    row = 2
-    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-    fill_white = PatternFill(start_color='FFFFFF', end_color='FFFFFF', fill_type='solid')
-    fill_gray = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
-
-    for emp in employees:
-        emp = normalize_family(emp)
-        marital_status = emp.get('marital_status', '').strip().lower()
-        fill = fill_white if sr_no % 2 != 0 else fill_gray
-
-        ws.append([
-            sr_no,
-            emp.get('employee_id', ''),
-            emp.get('name', ''),
-            format_date_ddmmyyyy(emp.get('dob', '')),
-            emp.get('age', ''),
-            'Employee',
-            emp.get('gender', ''),
-            emp.get('designation', ''),
-            emp.get('phone', ''),
-            format_date_ddmmyyyy(emp.get('date_of_joining', '')),
-            emp.get('sum_insured_gmc', ''),
-            emp.get('sum_insured_gpa', ''),
-            emp.get('sum_insured_gtl', ''),
-            emp.get('email', ''),
-            emp.get('marital_status', '')
-        ])
-        for col in range(1, 16):
-            cell = ws.cell(row=row, column=col)
-            cell.fill = fill
-            cell.border = thin_border
-        row += 1
-
-        if marital_status in ['married', 'widowed', 'divorced']:
-            for member in emp.get('family_members', []):
-                ws.append([
-                    '', '', member.get('name', ''),
-                    format_date_ddmmyyyy(member.get('date_of_birth', '')),
-                    member.get('age', ''),
-                    member.get('relationship', ''),
-                    member.get('gender', ''), '', '', '', '', '', '', '', ''
-                ])
-                ws[f'C{row}'].alignment = Alignment(indent=1)
-                for col in range(1, 16):
-                    cell = ws.cell(row=row, column=col)
-                    cell.fill = fill
-                    cell.border = thin_border
-                row += 1
-
-        for _ in range(2):
-            ws.append([''] * 15)
-            row += 1
-        sr_no += 1
+def _send_excel(file_stream, cache_key):
+    file_stream.seek(0)
+    if cache_key:
+        export_cache.store(cache_key, 'excel', file_stream)
+        file_stream.seek(0)
+    response = send_file(
+        file_stream,
+        as_attachment=True,
+        download_name='employees_nested.xlsx',
+        mimetype=EXCEL_MIMETYPE
+    )
+    if cache_key:
+        response.set_etag(cache_key)
+    return response
 
+def generate_excel(rows, progress, cache_key=None):
     file_stream = io.BytesIO()
-    wb.save(file_stream)
+    write_excel_styled_rows(rows, file_stream)
+    _observe('excel', 'memory', progress, file_stream.tell())
+    return _send_excel(file_stream, cache_key)
+
+def generate_excel_streaming(rows, progress, cache_key=None):
+    """
+    High-volume Excel path, used once an export reaches
+    EXCEL_STREAMING_THRESHOLD employees: write-only workbook spooled to a
+    temporary file instead of RAM.
+    """
+    file_stream = tempfile.TemporaryFile(suffix='.xlsx')
+    write_excel_rows(rows, file_stream)
+    _observe('excel', 'streaming', progress, file_stream.tell())
+    return _send_excel(file_stream, cache_key)
+
+def generate_parquet(query, cache_key=None):
+    """Employees and dependents as two typed Parquet tables in one zip (see parquet_export.py)."""
+    started = time.perf_counter()
+    file_stream = tempfile.TemporaryFile(suffix='.zip')
+    rows = write_parquet(query, file_stream, current_app.config['EXPORT_PARQUET_BATCH_ROWS'])
+    metrics.observe_export('parquet', 'file', rows, file_stream.tell(), time.perf_counter() - started)
     file_stream.seek(0)
+    if cache_key:
+        export_cache.store(cache_key, 'parquet', file_stream)
+        file_stream.seek(0)
+    filename, mimetype = EXPORT_FORMATS['parquet']
+    response = send_file(file_stream, as_attachment=True, download_name=filename, mimetype=mimetype)
+    if cache_key:
+        response.set_etag(cache_key)
+    return response
+
+def generate_delta(since):
+    """
+    Employees added, changed or deleted after revision `since`, roster-wide
+    (search and selection do not apply). The response names the watermark
+    to pass as `since` next time, in X-Export-Watermark and the filename.
+    """
+    if not since.isdigit():
+        flash("Enter the revision watermark from the previous feed (0 for everything).", "danger")
+        return redirect(url_for('admin.admin_dashboard'))
+    since = int(since)
+    watermark = delta_watermark(since, current_app.config['DELTA_SETTLE_SECONDS'])
+    chunks = (chunk.encode('utf-8') for chunk in delta_csv_chunks(
+        iter_changes(since, watermark, current_app.config['EXPORT_BATCH_SIZE']),
+        current_app.config['EXPORT_CSV_CHUNK_ROWS']
+    ))
+    response = Response(stream_with_context(chunks), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename=employees_delta_{since}-{watermark}.csv'
+    response.headers['X-Export-Watermark'] = str(watermark)
+    return response
+
+# ── Background export jobs ───────────────────────────────────────
+
+@export_bp.route('/export_jobs', methods=['POST'])
+def submit_export_job():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized access.'}), 403
+
+    export_type, search, selected_ids = _export_params()
+    if export_type not in ('csv', 'excel'):
+        return jsonify({'error': 'Invalid export type'}), 400
+
+    job = export_queue.submit(export_type, search, selected_ids)
+    return jsonify(_job_status(job)), 202
 
+@export_bp.route('/export_jobs/<job_id>')
+def export_job_status(job_id):
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized access.'}), 403
+
+    job = export_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Export job not found.'}), 404
+    return jsonify(_job_status(job))
+
+@export_bp.route('/export_jobs/<job_id>/download')
+def download_export_job(job_id):
+    if session.get('role') != 'admin':
+        flash('Unauthorized access.', 'danger')
+        return redirect(url_for('auth.dashboard'))
+
+    job = export_queue.get(job_id)
+    if not job or job.get('status') != 'done' or export_queue.is_expired(job) or not os.path.exists(job['path']):
+        abort(404)
     return send_file(
-        file_stream,
+        job['path'],
         as_attachment=True,
-        download_name='employees_nested.xlsx',
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
\ No newline at end of file
+        download_name=job['filename'],
+        mimetype=job['mimetype']
+    )
+
+def _job_status(job):
+    status = {
+        'id': str(job['_id']),
+        'status': job['status'],
+        'rows_written': job.get('rows_written', 0),
+        'total': job.get('total'),
+        'error': job.get('error')
+    }
+    if job['status'] == 'done' and not export_queue.is_expired(job):
+        status['download_url'] = url_for('export.download_export_job', job_id=status['id'])
+    return status
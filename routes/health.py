@@ -0,0 +1,50 @@
+from flask import Blueprint, abort, jsonify, current_app
+from pymongo.errors import PyMongoError
+from extensions import mongo
+from cache import employee_cache
+from fragments import fragment_cache
+from metrics import operator_allowed
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/health')
+def health():
+    try:
+        mongo.client.admin.command('ping')
+    except PyMongoError as exc:
+        return jsonify({'status': 'error', 'mongo': str(exc)}), 503
+    return jsonify({'status': 'ok'})
+
+async def health_async(db):
+    """/health on the async read path (asgi.py)."""
+    try:
+        await db.command('ping')
+    except PyMongoError as exc:
+        return jsonify({'status': 'error', 'mongo': str(exc)}), 503
+    return jsonify({'status': 'ok'})
+
+@health_bp.route('/health/pool')
+def pool_stats():
+    if not operator_allowed():
+        abort(403)
+    config = current_app.config
+    return jsonify({
+        'pool': mongo.pool_stats.snapshot(),
+        'max_pool_size': config['MONGO_MAX_POOL_SIZE'],
+        'min_pool_size': config['MONGO_MIN_POOL_SIZE'],
+        'wait_queue_timeout_ms': config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+    })
+
+@health_bp.route('/health/cache')
+def cache_stats():
+    if not operator_allowed():
+        abort(403)
+    return jsonify({
+        'employee_cache': employee_cache.stats.snapshot(),
+        'entries': len(employee_cache),
+        'max_entries': employee_cache.max_entries,
+        'ttl': employee_cache.ttl,
+        'shared_backend': type(employee_cache.backend).__name__ if employee_cache.backend else None,
+        'fragment_cache': fragment_cache.stats.snapshot(),
+        'fragment_entries': len(fragment_cache),
+    })
@@ -1,7 +1,15 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from bson import ObjectId
-from models import employees_collection
-from utils import calc_age, normalize_family, _get_employee_by_session_id
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from extensions import employees_collection
+from utils import calc_age, _get_employee_by_session_id, _get_employee_by_session_id_async
+from family import normalize_family, family_view
+from search import search_keys
+from dates import to_iso_date
+from cache import employee_cache
+from stats import STATS_PROJECTION, record_change
+from records import Employee
+from revisions import stamp
 
 main_bp = Blueprint('main', __name__)
 
@@ -12,13 +20,13 @@ def complete_profile(employee_id=None):
     is_user = session.get('role') == 'user'
 
     if is_admin and employee_id:
-        employee = employees_collection.find_one({'_id': ObjectId(employee_id)})
+        employee = employee_cache.by_id(employee_id)
         if not employee:
             flash("Employee not found.", "danger")
             return redirect(url_for('admin.admin_dashboard'))
     elif is_user and not employee_id:
         emp_id = session.get('mongo_id')
-        employee = employees_collection.find_one({'_id': ObjectId(emp_id)})
+        employee = employee_cache.by_id(emp_id)
         if not employee:
             flash("Employee not found.", "danger")
             return redirect(url_for('auth.dashboard'))
@@ -40,16 +48,25 @@ def complete_profile(employee_id=None):
         if not emp_id_form:
             flash("Employee ID is required.", "danger")
             return redirect(request.url)
-        conflict = employees_collection.find_one({'employee_id': emp_id_form, '_id': {'$ne': employee['_id']}})
+        conflict = employees_collection.find_one({'employee_id': emp_id_form, '_id': {'$ne': employee['_id']}},
+                                                 {'_id': 1})
         if conflict:
             flash("Employee ID already exists.", "danger")
             return redirect(request.url)
         form_data['employee_id'] = emp_id_form
 
+        # Store dates as ISO so reads never need fallback parsing
+        for key in ('dob', 'date_of_joining'):
+            if key in form_data:
+                form_data[key] = to_iso_date(form_data[key])
+
         phone = form_data.get('phone', '').strip()
         if not phone.isdigit() or len(phone) != 10:
             flash("Phone number must be exactly 10 digits.", "danger")
             return redirect(request.url)
+        if employees_collection.find_one({'phone': phone, '_id': {'$ne': employee['_id']}}, {'_id': 1}):
+            flash("An account with this phone already exists.", "danger")
+            return redirect(request.url)
 
        
         import re
@@ -64,7 +81,7 @@ def complete_profile(employee_id=None):
         marital_status = form_data.get('marital_status')
         if marital_status == 'married':
             spouse_name = form_data.pop('spouse_name', '').strip()
-            spouse_dob = form_data.pop('spouse_dob', '')
+            spouse_dob = to_iso_date(form_data.pop('spouse_dob', ''))
             spouse_gender = form_data.pop('spouse_gender', '')
             spouse_age = calc_age(spouse_dob) if spouse_dob else ''
             if not spouse_name or not spouse_dob or not spouse_gender:
@@ -90,7 +107,7 @@ def complete_profile(employee_id=None):
         if marital_status in ['married', 'divorced/widowed']:
             for i in range(total_children):
                 name = request.form.get(f'child_name_{i}', '').strip()
-                dob = request.form.get(f'child_dob_{i}', '')
+                dob = to_iso_date(request.form.get(f'child_dob_{i}', ''))
                 phone_c = request.form.get(f'child_phone_{i}', '').strip()
                 gender = request.form.get(f'child_gender_{i}', '')
                 age = calc_age(dob) if dob else ''
@@ -124,7 +141,7 @@ def complete_profile(employee_id=None):
         for i in range(total_parents):
             rel = request.form.get(f'parent_relationship_{i}', '')
             name = request.form.get(f'parent_name_{i}', '').strip()
-            dob = request.form.get(f'parent_dob_{i}', '')
+            dob = to_iso_date(request.form.get(f'parent_dob_{i}', ''))
             age = request.form.get(f'parent_age_{i}', '') or (calc_age(dob) if dob else '')
             if rel in seen_parent_rels:
                 flash(f"Duplicate parent relationship '{rel}' is not allowed.", "danger")
@@ -146,7 +163,24 @@ def complete_profile(employee_id=None):
             #session['details_completed'] = True  #remove
             session['mongo_id'] = str(employee['_id'])
 
-        employees_collection.update_one({'_id': employee['_id']}, {'$set': form_data})
+        form_data.update(family_view(form_data['family_members']))
+        form_data['search_keys'] = search_keys({**employee, **form_data})
+        try:
+            # Diff stats against what the write replaced, not the cached copy.
+            before = employees_collection.find_one_and_update(
+                {'_id': employee['_id']}, {'$set': stamp(form_data)},
+                projection=STATS_PROJECTION, return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError as exc:
+            # Taken by a concurrent write after the checks above.
+            if 'phone' in (exc.details or {}).get('keyPattern', {}):
+                flash("An account with this phone already exists.", "danger")
+            else:
+                flash("Employee ID already exists.", "danger")
+            return redirect(request.url)
+        if before:
+            record_change(before, {**before, **form_data})
+        employee_cache.invalidate(employee['_id'], [employee.get('employee_id'), form_data['employee_id']])
 
         if is_admin:
             flash("Changes saved successfully.", "success")
@@ -159,7 +193,7 @@ def complete_profile(employee_id=None):
 
     return render_template(
         "complete_profile.html",
-        employee=normalize_family(employee),
+        employee=normalize_family(employee, persist=True),
         is_admin=is_admin,
         readonly=readonly,
         show_submit=show_submit,
@@ -179,7 +213,7 @@ def employee_detail(employee_id=None):
 
     # Admin can view any profile by ID
     if role == 'admin' and employee_id:
-        employee = employees_collection.find_one({'employee_id': employee_id})
+        employee = employee_cache.by_employee_id(employee_id)
         if not employee:
             flash('Employee not found.', 'danger')
             return redirect(url_for('admin.admin_dashboard'))
@@ -197,6 +231,37 @@ def employee_detail(employee_id=None):
             flash("Please complete your profile first.", "warning")
             return redirect(url_for('main.complete_profile'))
 
-    return render_template("employee_detail.html", employee=normalize_family(employee))
+    employee = Employee.from_doc(normalize_family(employee, persist=True))
+    return render_template("employee_detail.html", employee=employee)
+
+
+async def employee_detail_async(db, employee_id=None):
+    """employee_detail on the async read path (asgi.py); `db` is an async database."""
+    role = session.get('role')
+
+    if role not in ['user', 'admin']:
+        flash('Unauthorized access.', 'danger')
+        return redirect(url_for('auth.dashboard'))
+
+    if role == 'admin' and employee_id:
+        employee = await employee_cache.by_employee_id_async(db['employees'], employee_id)
+        if not employee:
+            flash('Employee not found.', 'danger')
+            return redirect(url_for('admin.admin_dashboard'))
+
+    else:
+        employee = await _get_employee_by_session_id_async(db['employees'], session.get('mongo_id'))
+
+        if not employee:
+            flash('Your session has expired. Please log in again.', 'warning')
+            return redirect(url_for('auth.dashboard'))
+
+        if not employee.get('details_completed', False):
+            flash("Please complete your profile first.", "warning")
+            return redirect(url_for('main.complete_profile'))
+
+    # Old family layouts are upgraded in memory only; the threaded view and
+    # `flask family backfill` write them back.
+    return render_template("employee_detail.html", employee=Employee.from_doc(normalize_family(employee)))
 
 
@@ -0,0 +1,125 @@
+import re
+import click
+from flask.cli import AppGroup
+from pymongo import UpdateOne
+from extensions import employees_collection
+
+# Employee documents carry a `search_keys` array maintained on every write and
+# covered by a multikey index, so a roster search is one index seek:
+#   '=<value>'  normalized value of an exact-match field
+#   '~<prefix>' prefix of a name/email token (or of the whole name/email)
+#
+# Name and email match on the start of a word (or of the whole value), not on
+# any substring as the earlier regex search did: 'sharma' finds 'Priya Sharma'
+# but 'harma' no longer does. Employees written before search keys existed are
+# backfilled at bootstrap when there are only a few (BOOTSTRAP_BACKFILL_LIMIT),
+# otherwise by `flask search reindex --missing-only`.
+SEARCH_KEYS_FIELD = 'search_keys'
+EXACT_FIELDS = ['employee_id', 'phone', 'gender', 'designation', 'department']
+PREFIX_FIELDS = ['name', 'email']
+MAX_PREFIX = 32
+# Bootstrap fills in at most this many employees without search keys itself;
+# a larger backlog is left to `flask search reindex --missing-only`.
+BOOTSTRAP_BACKFILL_LIMIT = 500
+
+_MISSING_KEYS = {SEARCH_KEYS_FIELD: {'$exists': False}}
+_SOURCE_PROJECTION = {field: 1 for field in EXACT_FIELDS + PREFIX_FIELDS}
+
+_TOKEN_SPLIT = re.compile(r'[\s._@+\-]+')
+
+
+def normalize(value):
+    """Lowercase and collapse whitespace; None and non-strings become ''."""
+    if value is None:
+        return ''
+    return ' '.join(str(value).split()).lower()
+
+
+def _prefix_tokens(value):
+    tokens = {value}
+    tokens.update(t for t in _TOKEN_SPLIT.split(value) if t)
+    return tokens
+
+
+def search_keys(emp):
+    """Compute the search keys for an employee document."""
+    keys = set()
+    for field in EXACT_FIELDS:
+        value = normalize(emp.get(field))
+        if value:
+            keys.add('=' + value)
+    for field in PREFIX_FIELDS:
+        value = normalize(emp.get(field))
+        if not value:
+            continue
+        for token in _prefix_tokens(value):
+            for size in range(1, min(len(token), MAX_PREFIX) + 1):
+                keys.add('~' + token[:size])
+    return sorted(keys)
+
+
+def build_search_query(term):
+    """
+    Mongo filter for a roster search: case-insensitive equality on the exact
+    fields, or a word/whole-value prefix of name or email.
+
+    Terms longer than MAX_PREFIX seek on their first MAX_PREFIX characters
+    and confirm the rest with a regex over the already narrowed documents.
+    """
+    value = normalize(term)
+    if not value:
+        return {}
+    if len(value) <= MAX_PREFIX:
+        return {SEARCH_KEYS_FIELD: {'$in': ['=' + value, '~' + value]}}
+    pattern = re.escape(' '.join(str(term).split()))
+    return {'$or': [
+        {SEARCH_KEYS_FIELD: '=' + value},
+        {'$and': [
+            {SEARCH_KEYS_FIELD: '~' + value[:MAX_PREFIX]},
+            {'$or': [{field: {'$regex': pattern, '$options': 'i'}} for field in PREFIX_FIELDS]}
+        ]}
+    ]}
+
+
+def backfill_missing(limit=BOOTSTRAP_BACKFILL_LIMIT):
+    """
+    Search keys for a few employees saved without them (the seeded admin,
+    profiles from before search keys), one update each. Returns the count
+    updated, or None without writing when more than `limit` are missing.
+    """
+    if employees_collection.count_documents(_MISSING_KEYS, limit=limit + 1) > limit:
+        return None
+    updated = 0
+    for emp in employees_collection.find(_MISSING_KEYS, _SOURCE_PROJECTION):
+        result = employees_collection.update_one(
+            {'_id': emp['_id']}, {'$set': {SEARCH_KEYS_FIELD: search_keys(emp)}}
+        )
+        updated += result.modified_count
+    return updated
+
+
+def reindex(batch_size=1000, missing_only=False):
+    """Recompute search keys for existing employees in batches. Returns the count updated."""
+    query = _MISSING_KEYS if missing_only else {}
+    updated = 0
+    batch = []
+    for emp in employees_collection.find(query, _SOURCE_PROJECTION).batch_size(batch_size):
+        batch.append(UpdateOne({'_id': emp['_id']}, {'$set': {SEARCH_KEYS_FIELD: search_keys(emp)}}))
+        if len(batch) >= batch_size:
+            updated += employees_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += employees_collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+search_cli = AppGroup('search', help='Maintain roster search keys.')
+
+
+@search_cli.command('reindex')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--missing-only', is_flag=True, help='Only employees that have no search keys yet.')
+def reindex_command(batch_size, missing_only):
+    """Backfill search keys for existing employees."""
+    updated = reindex(batch_size=batch_size, missing_only=missing_only)
+    click.echo(f'Updated search keys for {updated} employee(s).')
@@ -0,0 +1,300 @@
+"""
+Roster statistics for the admin dashboard.
+
+One summary document in `roster_stats` holds running totals: employees,
+completed profiles, counts by department, marital status and gender,
+dependents by relationship, sum-insured totals and a birth-year histogram
+(age bands are derived from it when read, so they never go stale as people
+age). The dashboard reads it with a single lookup by _id.
+
+Write paths compute what an employee contributes before and after the write
+and `$inc` the difference. The read-then-write is not atomic, so concurrent
+edits of the same employee or a crash between the write and the `$inc` can
+leave the totals slightly off; `reconcile()` rebuilds them from a full scan.
+Run it from one place: `flask stats reconcile` from cron, or the background
+thread (STATS_RECONCILE_SECONDS, off by default) in a single process. Every
+$inc also bumps the summary's `seq`, and reconcile only replaces the summary
+if `seq` is unchanged since its scan began, so increments that land during
+the scan are never overwritten; it rescans instead.
+
+The same collection holds the roster version, a counter every write path
+bumps whether or not the totals change; the export cache keys on it. Write
+paths also draw employee revisions from it (next_revision) before writing,
+and the bump after the write keeps an export that raced the write from being
+cached under the final version.
+"""
+import logging
+import threading
+from collections import Counter
+from datetime import date, datetime, timezone
+import click
+from flask.cli import AppGroup
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from extensions import employees_collection, roster_stats_collection
+from dates import parse_date
+
+log = logging.getLogger(__name__)
+
+SUMMARY_ID = 'summary'
+VERSION_ID = 'version'
+# Write counter inside the summary document (see reconcile).
+SEQ_FIELD = 'seq'
+RECONCILE_ATTEMPTS = 3
+
+# Fields an employee's contribution is computed from.
+STATS_PROJECTION = {
+    'role': 1, 'details_completed': 1, 'department': 1, 'marital_status': 1, 'gender': 1, 'dob': 1,
+    'family_members.relationship': 1, 'sum_insured_gmc': 1, 'sum_insured_gpa': 1, 'sum_insured_gtl': 1,
+}
+
+# (label, lowest age, highest age); ages are by birth year, so within a year.
+AGE_BANDS = [
+    ('Under 25', 0, 24), ('25-34', 25, 34), ('35-44', 35, 44), ('45-54', 45, 54), ('55+', 55, 200),
+]
+
+_UNSET = '(none)'
+
+
+def _key(value):
+    """A map key safe for dotted $inc paths; `_unkey` reverses it."""
+    value = ' '.join(str(value or '').split()) or _UNSET
+    return value.replace('%', '%25').replace('.', '%2E').replace('$', '%24')
+
+
+def _unkey(key):
+    return key.replace('%24', '$').replace('%2E', '.').replace('%25', '%')
+
+
+def _amount(value):
+    try:
+        number = float(str(value).replace(',', '').strip())
+    except ValueError:
+        return 0
+    return int(number) if number.is_integer() else number
+
+
+def contribution(emp):
+    """What one employee adds to the summary, as {dotted path: amount}."""
+    if not emp or emp.get('role') == 'admin':
+        return Counter()
+    counts = Counter({
+        'employees': 1,
+        f"by_department.{_key(emp.get('department'))}": 1,
+        f"by_marital_status.{_key((emp.get('marital_status') or '').strip().lower())}": 1,
+        f"by_gender.{_key(emp.get('gender'))}": 1,
+    })
+    if emp.get('details_completed'):
+        counts['completed'] += 1
+    for member in emp.get('family_members') or []:
+        counts['dependents_total'] += 1
+        counts[f"dependents.{_key(member.get('relationship'))}"] += 1
+    for cover in ('gmc', 'gpa', 'gtl'):
+        amount = _amount(emp.get(f'sum_insured_{cover}', ''))
+        if amount:
+            counts[f'sum_insured.{cover}'] += amount
+    dob = parse_date(emp.get('dob'))
+    counts[f"birth_years.{dob.year if dob else _UNSET}"] += 1
+    return counts
+
+
+def diff(before, after):
+    """The $inc that turns `before`'s contribution into `after`'s."""
+    delta = Counter(contribution(after))
+    delta.subtract(contribution(before))
+    return {path: amount for path, amount in delta.items() if amount}
+
+
+def bump_version():
+    roster_stats_collection.update_one({'_id': VERSION_ID}, {'$inc': {'value': 1}}, upsert=True)
+
+
+def next_revision(count=1):
+    """Reserve `count` revisions; returns the last one."""
+    doc = roster_stats_collection.find_one_and_update(
+        {'_id': VERSION_ID}, {'$inc': {'value': count}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return doc['value']
+
+
+def roster_version():
+    doc = roster_stats_collection.find_one({'_id': VERSION_ID})
+    return doc['value'] if doc else 0
+
+
+def apply(delta):
+    """Fold a delta into the summary; every call is a roster change and bumps the version."""
+    if delta:
+        roster_stats_collection.update_one({'_id': SUMMARY_ID}, {'$inc': {**delta, SEQ_FIELD: 1}}, upsert=True)
+    bump_version()
+
+
+def record_change(before, after):
+    """Fold one employee write into the summary; pass None for a missing side."""
+    apply(diff(before, after))
+
+
+def record_deleted(employees):
+    """Fold removed employees into the summary."""
+    delta = Counter()
+    for emp in employees:
+        delta.subtract(contribution(emp))
+    apply({path: amount for path, amount in delta.items() if amount})
+
+
+def _nest(counts):
+    """Dotted paths back into the stored nested shape."""
+    doc = {}
+    for path, amount in counts.items():
+        if '.' in path:
+            group, key = path.split('.', 1)
+            doc.setdefault(group, {})[key] = amount
+        else:
+            doc[path] = amount
+    return doc
+
+
+def reconcile(batch_size=1000):
+    """
+    Rebuild the summary from a full scan. Returns the paths whose stored
+    value was off (path -> (stored, actual)). Raises RuntimeError if writes
+    kept landing during the scan for RECONCILE_ATTEMPTS scans in a row.
+    """
+    for _ in range(RECONCILE_ATTEMPTS):
+        drift = _reconcile_once(batch_size)
+        if drift is not None:
+            return drift
+    raise RuntimeError('Roster summary kept changing during the scan; not rebuilt.')
+
+
+def _reconcile_once(batch_size):
+    """One scan and conditional replace; None if the summary changed meanwhile."""
+    seq = (roster_stats_collection.find_one({'_id': SUMMARY_ID}, {SEQ_FIELD: 1}) or {}).get(SEQ_FIELD)
+    totals = Counter()
+    cursor = employees_collection.find({'role': {'$ne': 'admin'}}, STATS_PROJECTION).batch_size(batch_size)
+    try:
+        for emp in cursor:
+            totals.update(contribution(emp))
+    finally:
+        cursor.close()
+
+    stored = roster_stats_collection.find_one({'_id': SUMMARY_ID}) or {}
+    if stored.get(SEQ_FIELD) != seq:
+        return None
+    flat = {}
+    for name, value in stored.items():
+        if isinstance(value, dict):
+            flat.update({f'{name}.{key}': amount for key, amount in value.items()})
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and name != SEQ_FIELD:
+            flat[name] = value
+    drift = {path: (flat.get(path, 0), totals.get(path, 0))
+             for path in set(flat) | set(totals) if flat.get(path, 0) != totals.get(path, 0)}
+
+    doc = _nest({path: amount for path, amount in totals.items() if amount})
+    doc['reconciled_at'] = datetime.now(timezone.utc)
+    doc[SEQ_FIELD] = (seq or 0) + 1
+    try:
+        # A missing seq matches a summary that has none yet. If the filter
+        # misses an existing summary, the upsert's insert collides on _id.
+        roster_stats_collection.replace_one({'_id': SUMMARY_ID, SEQ_FIELD: seq}, doc, upsert=True)
+    except DuplicateKeyError:
+        return None
+    return drift
+
+
+def ensure_summary():
+    """Build the summary if it has never been reconciled."""
+    stored = roster_stats_collection.find_one({'_id': SUMMARY_ID}, {'reconciled_at': 1})
+    if not stored or 'reconciled_at' not in stored:
+        reconcile()
+
+
+def _age_bands(birth_years, today=None):
+    this_year = (today or date.today()).year
+    bands = {label: 0 for label, _, _ in AGE_BANDS}
+    bands['Unknown'] = 0
+    for year, count in birth_years.items():
+        age = this_year - int(year) if year.isdigit() else None
+        for label, low, high in AGE_BANDS:
+            if age is not None and low <= age <= high:
+                bands[label] += count
+                break
+        else:
+            bands['Unknown'] += count
+    return [(label, count) for label, count in bands.items() if count]
+
+
+def _sorted_counts(group):
+    return sorted(((_unkey(key), count) for key, count in (group or {}).items() if count),
+                  key=lambda item: (-item[1], item[0]))
+
+
+def summary():
+    """The dashboard's view of the summary, or None before the first reconcile."""
+    return summary_view(roster_stats_collection.find_one({'_id': SUMMARY_ID}))
+
+
+def summary_view(doc):
+    """Shape a stored summary document for the dashboard (None if not reconciled yet)."""
+    if not doc or 'reconciled_at' not in doc:
+        return None
+    return {
+        'employees': doc.get('employees', 0),
+        'completed': doc.get('completed', 0),
+        'dependents_total': doc.get('dependents_total', 0),
+        'dependents': _sorted_counts(doc.get('dependents')),
+        'by_department': _sorted_counts(doc.get('by_department')),
+        'by_marital_status': _sorted_counts(doc.get('by_marital_status')),
+        'by_gender': _sorted_counts(doc.get('by_gender')),
+        'sum_insured': {cover: doc.get('sum_insured', {}).get(cover, 0) for cover in ('gmc', 'gpa', 'gtl')},
+        'age_bands': _age_bands(doc.get('birth_years') or {}),
+        'reconciled_at': doc['reconciled_at'],
+    }
+
+
+class StatsReconciler:
+    """Reconciles the summary every STATS_RECONCILE_SECONDS in a daemon thread."""
+
+    def __init__(self):
+        self.interval = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.interval = app.config['STATS_RECONCILE_SECONDS']
+        app.extensions['stats_reconciler'] = self
+        if self.interval > 0 and self._thread is None:
+            # The first run waits a full interval: startup never touches MongoDB.
+            self._thread = threading.Thread(target=self._run, args=(app,), name='stats-reconcile', daemon=True)
+            self._thread.start()
+
+    def _run(self, app):
+        while not self._stop.wait(self.interval):
+            try:
+                with app.app_context():
+                    drift = reconcile()
+                if drift:
+                    log.warning('Roster stats drifted on %d path(s): %s', len(drift), sorted(drift)[:10])
+            except Exception:
+                log.exception('Roster stats reconciliation failed')
+
+    def stop(self):
+        self._stop.set()
+
+
+stats_reconciler = StatsReconciler()
+
+stats_cli = AppGroup('stats', help='Roster statistics.')
+
+
+@stats_cli.command('reconcile')
+@click.option('--batch-size', default=1000, show_default=True)
+def reconcile_command(batch_size):
+    """Rebuild the roster summary from a full scan."""
+    try:
+        drift = reconcile(batch_size)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc))
+    for path, (stored, actual) in sorted(drift.items()):
+        click.echo(f'{_unkey(path)}: {stored} -> {actual}')
+    click.echo(f'Roster summary rebuilt; {len(drift)} value(s) corrected.')